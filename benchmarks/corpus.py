@@ -0,0 +1,121 @@
+"""
+Synthetic org-mode recipe corpora shaped like content/*.org: property
+drawers, `***` ingredient groups, multi-line ingredients and long
+directions. Generation is deterministic for a given seed.
+"""
+from pathlib import Path
+import random
+
+
+ADJECTIVES = [
+    "Smoky", "Spicy", "Creamy", "Roasted", "Grilled", "Braised", "Crispy",
+    "Lemony", "Garlicky", "Sticky", "Herbed", "Golden", "Rustic", "Quick",
+]
+DISHES = [
+    "Chicken", "Tofu", "Lentil", "Mushroom", "Salmon", "Pork", "Chickpea",
+    "Beef", "Shrimp", "Cauliflower", "Eggplant", "Bean", "Potato", "Squash",
+]
+FORMS = [
+    "Soup", "Stew", "Curry", "Tacos", "Salad", "Pasta", "Bake", "Stir Fry",
+    "Casserole", "Skillet", "Bowl", "Pie", "Sandwich", "Risotto",
+]
+UNITS = ["cup", "cups", "tbsp", "tsp", "oz", "lb", "g", "cloves", "cans", ""]
+QUANTITIES = ["1", "2", "3", "1/2", "1/4", "3/4", "1 1/2", "2 1/2", "½", "1-2"]
+ITEMS = [
+    "all-purpose flour", "salt", "sugar", "butter", "olive oil", "garlic",
+    "onion, diced", "tomatoes, chopped", "milk", "large eggs", "chicken stock",
+    "black pepper", "cumin", "paprika", "rice", "lemon juice", "parsley",
+    "carrots", "celery", "heavy cream", "parmesan (grated)", "spinach",
+    "soy sauce", "ginger", "honey", "vinegar", "potatoes", "beans",
+]
+GROUPS = ["Sauce", "Marinade", "Topping", "Dough", "Filling", "Dressing"]
+WORDS = (
+    "stir the mixture gently until combined then cover and simmer over low "
+    "heat while the flavors meld season to taste and adjust the thickness "
+    "with a splash of water if needed before transferring to a warm dish"
+).split()
+
+
+def recipe_name(rng: random.Random, n: int):
+    return f"{rng.choice(ADJECTIVES)} {rng.choice(DISHES)} {rng.choice(FORMS)} {n}"
+
+
+def ingredient_line(rng: random.Random):
+    unit = rng.choice(UNITS)
+    parts = [rng.choice(QUANTITIES)] + ([unit] if unit else []) + [rng.choice(ITEMS)]
+
+    return " ".join(parts)
+
+
+def recipe_lines(rng: random.Random, n: int):
+    """
+    Return the org lines for one top-level recipe heading.
+    """
+    lines = [f"* {recipe_name(rng, n)}"]
+
+    if rng.random() < 0.8:
+        lines += [
+            ":PROPERTIES:",
+            f":prep-time: {rng.randint(5, 60)} min",
+            f":cook-time: {rng.randint(10, 240)} min",
+            f":servings: {rng.randint(1, 12)}",
+            f":source-url: http://example.com/recipes/{n}",
+            ":END:",
+        ]
+
+    lines.append("** Ingredients")
+    for _ in range(rng.randint(3, 10)):
+        lines.append(f"- {ingredient_line(rng)}")
+        # an ingredient that wraps onto a second line
+        if rng.random() < 0.1:
+            lines.append(f"  {rng.choice(['or', 'plus', 'about'])} {rng.choice(ITEMS)}")
+    for group in rng.sample(GROUPS, rng.randint(0, 2)):
+        lines.append(f"*** {group}")
+        for _ in range(rng.randint(2, 6)):
+            lines.append(f"- {ingredient_line(rng)}")
+
+    lines.append("** Directions")
+    for step in range(1, rng.randint(3, 12) + 1):
+        n_words = rng.randint(8, 60)
+        words = [rng.choice(WORDS) for _ in range(n_words)]
+        # long steps are wrapped across lines like hand-written org files
+        text = [" ".join(words[i:i + 12]) for i in range(0, n_words, 12)]
+        lines.append(f"{step}. {text[0].capitalize()}.")
+        lines += [f"   {line}" for line in text[1:]]
+
+    return lines
+
+
+def generate_corpus(out_dir, n_recipes: int, recipes_per_file: int = 20, seed: int = 0):
+    """
+    Write n_recipes recipes into out_dir/*.org, recipes_per_file per file.
+    Returns the list of files written.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+
+    fps = []
+    for first in range(0, n_recipes, recipes_per_file):
+        fp = out_dir/f"recipes-{first // recipes_per_file:06d}.org"
+        lines = []
+        for n in range(first, min(first + recipes_per_file, n_recipes)):
+            lines += recipe_lines(rng, n)
+        fp.write_text("\n".join(lines) + "\n")
+        fps.append(fp)
+
+    return fps
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a synthetic org recipe corpus")
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--recipes", type=int, default=1000)
+    parser.add_argument("--recipes-per-file", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fps = generate_corpus(args.out_dir, args.recipes, args.recipes_per_file, args.seed)
+    print(f"Wrote {args.recipes} recipes to {len(fps)} files in {args.out_dir}")
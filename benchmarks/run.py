@@ -0,0 +1,334 @@
+"""
+Time the ingest pipeline and every route against synthetic catalogs:
+
+    python -m benchmarks.run --sizes 100,10000,100000 --out bench.json
+    python -m benchmarks.run --sizes 100,10000 --compare bench.json
+
+Each size gets a fresh corpus and database in a temporary directory. The
+routes are timed through the Flask test client in a fresh interpreter per
+database, so no cache or connection outlives its catalog.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+SRC_DIR = Path(__file__).resolve().parent.parent/"src"
+sys.path.insert(0, str(SRC_DIR))
+
+import dbtools as dbt
+import extract
+import similar
+from benchmarks.corpus import generate_corpus
+
+
+DEFAULT_SIZES = [100, 10_000, 100_000]
+
+# a result regresses when its median is this much slower than the baseline
+DEFAULT_THRESHOLD = 0.20
+
+
+def summarize(timings):
+    return dict(
+        n=len(timings),
+        min=min(timings),
+        median=statistics.median(timings),
+        mean=statistics.fmean(timings),
+        max=max(timings),
+    )
+
+
+def time_calls(fn, args_list, repeat: int = 1, warmup: int = 1):
+    """
+    Call fn(*args) for each args in args_list, `repeat` times over, after
+    `warmup` untimed calls; return a summary of the per-call seconds.
+    """
+    for args in args_list[:warmup]:
+        fn(*args)
+
+    timings = []
+    for _ in range(repeat):
+        for args in args_list:
+            start = time.perf_counter()
+            fn(*args)
+            timings.append(time.perf_counter() - start)
+
+    return summarize(timings)
+
+
+def time_once(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+
+    return summarize([time.perf_counter() - start]), result
+
+
+def add_schedule(con, n_recipes: int, n_weeks: int = 104, seed: int = 0):
+    """
+    Fill recipe_schedule with n_weeks of random dinners so the schedule
+    and top-recipes routes have something to read.
+    """
+    rng = random.Random(seed)
+    first_week = date(2020, 1, 5)
+    add_time = str(datetime(2020, 1, 1))
+    records = []
+    for week in range(n_weeks):
+        week_start = first_week + timedelta(weeks=week)
+        for day in range(7):
+            records.append((
+                week_start.isoformat(),
+                (week_start + timedelta(days=day)).isoformat(),
+                day,
+                rng.randint(1, n_recipes),
+                rng.randint(1, 3),
+                add_time,
+            ))
+
+    cur = con.cursor()
+    cur.execute("BEGIN")
+    cur.executemany(
+        """
+        INSERT INTO recipe_schedule (
+          week_start, scheduled_day, day_of_week, recipe_id, quantity, added_datetime
+        ) VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        records
+    )
+    dbt.refresh_recipe_stats(cur)
+    dbt.bump_meta_value(cur, "schedule_version")
+    con.commit()
+
+    return first_week.isoformat()
+
+
+def bench_ingest(work_dir: Path, n_recipes: int, workers: int):
+    """
+    Generate a corpus and time extraction and loading it; leaves the
+    database at work_dir/data/recipe.db.
+    """
+    results = dict()
+
+    content_dir = work_dir/"content"
+    start = time.perf_counter()
+    fps = generate_corpus(content_dir, n_recipes)
+    print(f"  generated {n_recipes} recipes in {time.perf_counter() - start:.1f}s")
+
+    # per-file parse time, on a sample of files
+    sample = [(fp,) for fp in fps[:50]]
+    results["extract_data (per file)"] = time_calls(extract.extract_data, sample, repeat=3)
+
+    results["extract_recipes_from_fps (workers=1)"], recipes = time_once(
+        extract.extract_recipes_from_fps, fps, 1
+    )
+    if workers > 1:
+        results[f"extract_recipes_from_fps (workers={workers})"], recipes = time_once(
+            extract.extract_recipes_from_fps, fps, workers
+        )
+
+    data_dir = work_dir/"data"
+    data_dir.mkdir(exist_ok=True)
+    con = sqlite3.connect(data_dir/"recipe.db")
+    dbt.create_db(con)
+
+    start = time.perf_counter()
+    dbt.update_db(con, recipes, load_pragmas=True)
+    results["update_db"] = summarize([time.perf_counter() - start])
+
+    # loading again finds every recipe already present
+    results["update_db (no changes)"], _ = time_once(dbt.update_db, con, recipes)
+
+    results["refresh_recipe_neighbors"], _ = time_once(similar.refresh_recipe_neighbors, con)
+    results["refresh_recipe_neighbors (no changes)"], _ = time_once(similar.refresh_recipe_neighbors, con)
+
+    week_start = add_schedule(con, n_recipes)
+    con.close()
+
+    return results, week_start
+
+
+def route_requests(n_recipes: int, week_start: str, seed: int = 0):
+    """
+    The GET requests to time, as {name: [url, ...]}; urls are cycled
+    through so per-id caches see a realistic mix of hits and misses.
+    """
+    rng = random.Random(seed)
+    ids = [rng.randint(1, n_recipes) for _ in range(20)]
+    id_lists = [",".join(map(str, rng.sample(range(1, n_recipes + 1), min(14, n_recipes)))) for _ in range(5)]
+    qtys = ",".join(["1"] * 14)
+
+    return {
+        "GET /recipe-site/": ["/recipe-site/"],
+        "GET /recipe-site/recipe/<id>": [f"/recipe-site/recipe/{i}" for i in ids],
+        "GET /recipe-site/recipe-list.json": ["/recipe-site/recipe-list.json"],
+        "GET /recipe-site/recipe-list.json?limit=100": [
+            f"/recipe-site/recipe-list.json?limit=100&after_id={i}" for i in ids
+        ],
+        "GET /recipe-site/recipe-picker.json": [
+            f"/recipe-site/recipe-picker.json?q={q}" for q in ("", "s", "chick", "Smoky Chick", "zz")
+        ],
+        "GET /recipe-site/recipes.json": [f"/recipe-site/recipes.json?ids={l}" for l in id_lists],
+        "GET /recipe-site/recipe-search (name)": [
+            f"/recipe-site/recipe-search?search-terms={q}" for q in ("chick", "smoky curry", "tacos 12", "b")
+        ],
+        "GET /recipe-site/recipe-search (ingredients)": [
+            f"/recipe-site/recipe-search?search-terms={q}&fields=ingredients" for q in ("garlic", "cumin rice", "spin")
+        ],
+        "GET /recipe-site/ingredient-search": [
+            f"/recipe-site/ingredient-search?{q}" for q in (
+                "ingredients=garlic", "ingredients=garlic,rice&optional=cumin,lemon juice",
+                "optional=spinach,honey,ginger",
+            )
+        ],
+        "GET /recipe-site/grocery-list/": ["/recipe-site/grocery-list/"],
+        "GET /recipe-site/grocery-list-print/": [
+            f"/recipe-site/grocery-list-print/?recipe_ids={l}&recipe_quantities={qtys}" for l in id_lists
+        ],
+        "GET /recipe-site/recipe-scheduler/": ["/recipe-site/recipe-scheduler/"],
+        "GET /recipe-site/recipes-scheduled": [f"/recipe-site/recipes-scheduled?week-start={week_start}"],
+        "GET /recipe-site/top-recipes/": [
+            f"/recipe-site/top-recipes/?sort={key}" for key in ("times", "name", "last")
+        ],
+        "GET /recipe-site/db-health": ["/recipe-site/db-health"],
+        "GET /recipe-site/cache-stats": ["/recipe-site/cache-stats"],
+        "GET /recipe-site/static/<path>": ["/recipe-site/static/recipe-scheduler.js"],
+    }
+
+
+def bench_routes(data_dir: str, n_recipes: int, week_start: str, repeat: int = 5):
+    """
+    Time every route through the test client; runs in its own process.
+    """
+    os.environ["RECIPE_SITE_DATA_DIR"] = data_dir
+    sys.path.insert(0, str(SRC_DIR))
+    from app import app
+
+    client = app.test_client()
+    headers = {"Accept-Encoding": "gzip"}
+
+    def get(url):
+        response = client.get(url, headers=headers)
+        response.get_data()
+        if response.status_code >= 400:
+            raise RuntimeError(f"{url} returned {response.status_code}")
+
+    results = dict()
+    for name, urls in route_requests(n_recipes, week_start).items():
+        results[name] = time_calls(get, [(url,) for url in urls], repeat=repeat)
+
+    # a schedule write, alternating between two weeks
+    def post(week):
+        response = client.post(
+            "/recipe-site/recipe-scheduler/create-schedule"
+            f"?week-start={week}&weekdays-scheduled=0,1,2,3,4,5,6"
+            "&recipe-ids=1,2,3,4,5,6,7&recipe-counts=1,1,1,1,1,1,2"
+        )
+        if response.get_data(as_text=True) != "schedule-success":
+            raise RuntimeError(f"scheduling {week} failed")
+
+    results["POST /recipe-site/recipe-scheduler/create-schedule"] = time_calls(
+        post, [("2030-01-06",), ("2030-01-13",)], repeat=repeat
+    )
+
+    return results
+
+
+def run(sizes, workers: int, repeat: int):
+    results = dict()
+    spawn = multiprocessing.get_context("spawn")
+    for n_recipes in sizes:
+        print(f"Benchmarking {n_recipes} recipes")
+        with tempfile.TemporaryDirectory(prefix=f"recipe-bench-{n_recipes}-") as work_dir:
+            work_dir = Path(work_dir)
+            size_results, week_start = bench_ingest(work_dir, n_recipes, workers)
+
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                size_results.update(pool.submit(
+                    bench_routes, str(work_dir/"data"), n_recipes, week_start, repeat
+                ).result())
+
+        for name, summary in size_results.items():
+            print(f"  {name:<55} {1000 * summary['median']:10.2f} ms")
+        results[str(n_recipes)] = size_results
+
+    return dict(
+        meta=dict(
+            created=datetime.now().isoformat(timespec="seconds"),
+            python=platform.python_version(),
+            sqlite=sqlite3.sqlite_version,
+            platform=platform.platform(),
+            cpu_count=os.cpu_count(),
+            workers=workers,
+            repeat=repeat,
+        ),
+        results=results,
+    )
+
+
+def compare(baseline, current, threshold: float = DEFAULT_THRESHOLD):
+    """
+    Compare the medians of two result sets; return the list of
+    (size, name, baseline_median, current_median) regressions.
+    """
+    regressions = []
+    print(f"{'size':>8} {'benchmark':<55} {'baseline':>10} {'current':>10} {'change':>8}")
+    for size, size_results in current["results"].items():
+        base_results = baseline["results"].get(size, dict())
+        for name, summary in size_results.items():
+            if name not in base_results:
+                continue
+            base = base_results[name]["median"]
+            new = summary["median"]
+            change = (new - base) / base if base > 0 else 0.0
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions.append((size, name, base, new))
+            print(
+                f"{size:>8} {name:<55} {1000 * base:8.2f}ms {1000 * new:8.2f}ms "
+                f"{100 * change:+7.1f}%{flag}"
+            )
+
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark ingest and routes on synthetic catalogs")
+    parser.add_argument(
+        "--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+        help="comma separated catalog sizes (number of recipes)"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="extraction processes")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over each route's urls")
+    parser.add_argument("--out", type=Path, help="write results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="baseline JSON file to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help="relative slowdown of a median counted as a regression"
+    )
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    current = run(sizes, args.workers, args.repeat)
+
+    if args.out:
+        args.out.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"Wrote {args.out}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {100 * args.threshold:.0f}%")
+            sys.exit(1)
+        print("No regressions")
@@ -1,20 +1,43 @@
+import base64
+import functools
+import hashlib
+import json
+import logging
+import mimetypes
 import os
 import re
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from flask import (
-    Flask, render_template,
-    request, g, send_from_directory
+    Flask, render_template, make_response,
+    request, g, send_from_directory, stream_with_context
 )
 import sqlite3
 import appdbtools as apdb
-
+import dbtools as dbt
+from autocomplete import RecipeNameIndex
+import compression
+from dbpool import ConnectionPool
+from ingredients import describe_ingredient
+import metrics
+from pagecache import LRUCache
+from replica import CatalogReplica
+from slowlog import SlowQueryLog
+
+
+logging.basicConfig(
+    level=os.environ.get("RECIPE_SITE_LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
 
 # construct app and point app to useful folders
 app = Flask(__name__)
 app.template_folder = app.root_path + "/../templates/"
 app.static_folder = app.root_path + "/../static/"
-data_dir = app.root_path + "/../data/"
-print(f"Using data_dir = {data_dir}")
+data_dir = os.environ.get("RECIPE_SITE_DATA_DIR", app.root_path + "/../data/")
+logger.info("Using data_dir = %s", data_dir)
 
 WEEKDAYS = [
     "Sunday",
@@ -26,6 +49,15 @@ WEEKDAYS = [
     "Saturday",
 ]
 
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 500
+MAX_BATCH_RECIPES = 200
+MAX_RECIPE_LIST_LIMIT = 5000
+RECIPE_LIST_COLUMNS = ("recipe_id", "recipe_name")
+DEFAULT_PICKER_LIMIT = 50
+MAX_PICKER_LIMIT = 200
+SIMILAR_RECIPES_SHOWN = 5
+
 
 def dict_factory(cur:sqlite3.Cursor, row:sqlite3.Row):
     col_names = [col[0] for col in cur.description]
@@ -33,17 +65,114 @@ def dict_factory(cur:sqlite3.Cursor, row:sqlite3.Row):
     return {key: value for key, value in zip(col_names, row)}
 
 
+# long-lived connections shared by this worker's requests; their cursors
+# report SQL counts and time to request_metrics
+db_pool = ConnectionPool(f"{data_dir}/recipe.db", factory=metrics.InstrumentedConnection)
+request_metrics = metrics.Metrics()
+
+# the read connections are query_only, so bring the db's schema up to date
+# on the write connection before serving (a no-op unless a release added
+# migrations)
+_write_con = db_pool.checkout_write()
+try:
+    dbt.create_db(_write_con)
+finally:
+    db_pool.checkin_write(_write_con)
+
+# opt-in log of statements slower than RECIPE_SITE_SLOW_QUERY_MS, with
+# their query plans; parameters are redacted unless
+# RECIPE_SITE_SLOW_QUERY_REDACT=0
+slow_query_log = None
+if os.environ.get("RECIPE_SITE_SLOW_QUERY_MS"):
+    slow_query_log = SlowQueryLog(
+        threshold_ms=float(os.environ["RECIPE_SITE_SLOW_QUERY_MS"]),
+        redact=os.environ.get("RECIPE_SITE_SLOW_QUERY_REDACT", "1") != "0",
+    )
+    slow_query_log.install()
+
+
 def get_db(row_factory=sqlite3.Row):
+    """
+    Return this request's read-only connection, checked out of db_pool.
+    """
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(f"{data_dir}/recipe.db")
-        # use a Row factory for named access
-        db.row_factory = row_factory
+        db = g._database = db_pool.checkout()
+
+    # use a Row factory for named access
+    db.row_factory = row_factory
+
+    return db
+
+
+def get_write_db(row_factory=sqlite3.Row):
+    """
+    Return the worker's write connection, held until the request ends.
+    """
+    db = getattr(g, '_write_database', None)
+    if db is None:
+        db = g._write_database = db_pool.checkout_write()
+
+    db.row_factory = row_factory
+
+    return db
+
+
+# opt-in in-memory copy of the catalog tables for read-only catalog
+# queries (RECIPE_SITE_CATALOG_REPLICA=1); loaded here, i.e. in the uwsgi
+# master before it forks unless lazy-apps is on
+catalog_replica = None
+if os.environ.get("RECIPE_SITE_CATALOG_REPLICA", "0") != "0":
+    catalog_replica = CatalogReplica(f"{data_dir}/recipe.db", factory=metrics.InstrumentedConnection)
+    catalog_replica.load()
+
+
+def get_catalog_db(row_factory=sqlite3.Row):
+    """
+    Return a connection for read-only queries on the catalog tables: the
+    in-memory replica if enabled and on the current catalog version,
+    otherwise this request's get_db() connection.
+    """
+    if catalog_replica is None:
+        return get_db(row_factory)
+
+    db = getattr(g, '_catalog_database', None)
+    if db is None:
+        db = catalog_replica.checkout(get_meta_version("catalog_version"))
+        if db is None:
+            return get_db(row_factory)
+        g._catalog_database = db
+
+    db.row_factory = row_factory
 
     return db
 
 
-def populate_recipe_list():
+def begin_write(row_factory=sqlite3.Row):
+    """
+    Take the write lock (BEGIN IMMEDIATE) on the write connection and
+    return it. If a rebuild swapped in a new generation of the db while we
+    waited for the lock, start over on the new file, so no write lands in
+    a retired one.
+    """
+    while True:
+        db = get_write_db(row_factory)
+        db.execute("BEGIN IMMEDIATE")
+        if db_pool.is_current(db):
+            return db
+
+        db.rollback()
+        db_pool.checkin_write(g.pop('_write_database'))
+
+
+def get_catalog_version():
+    db = get_db()
+    cur = db.cursor()
+
+    return dbt.get_catalog_version(cur)
+
+
+def load_recipe_names():
     db = get_db()
     cur = db.cursor()
     query = cur.execute('''
@@ -53,87 +182,264 @@ def populate_recipe_list():
     FROM recipes;
     ''')
 
-    # get data
-    rows = query.fetchall()
+    return [(row[0], row[1]) for row in query.fetchall()]
 
-    # convert values
-    columns = [desc[0] for desc in cur.description]
-    column_vals = dict([(c, [row[c] for row in rows]) for c in columns])
 
-    return column_vals
+# per-worker autocomplete index, reloaded when the catalog version changes
+recipe_name_index = RecipeNameIndex(get_catalog_version, load_recipe_names)
 
+# rendered recipe pages, bounded by count and total size
+recipe_page_cache = LRUCache(
+    max_entries=int(os.environ.get("RECIPE_PAGE_CACHE_ENTRIES", 512)),
+    max_bytes=int(os.environ.get("RECIPE_PAGE_CACHE_BYTES", 16 * 1024 * 1024)),
+)
+
+
+def get_meta_version(meta_key):
+    """
+    Return a catalog_meta version, reusing the one conditional_get already
+    read for this request if available.
+    """
+    meta_values = getattr(g, '_meta_values', {})
+    if meta_key in meta_values:
+        return meta_values[meta_key][0]
 
-def get_recipe(recipe_id):
     db = get_db()
-    cur = db.cursor()
+    return dbt.get_meta_values(db.cursor(), [meta_key])[meta_key][0]
 
-    ## Get the Ingredients
-    query = cur.execute('''
-        SELECT
-           recipe_name,
-           source_url
-        FROM recipes
-        WHERE recipe_id = ?
-        ;
-        ''',
-        (recipe_id,)
+
+def get_response_version():
+    """
+    Fingerprint of the code, templates and static assets (pages embed
+    their static_url()s), so conditional-GET validators change on deploy.
+    Identical across the workers of one deployment.
+    """
+    sources = [Path(__file__)] + sorted(Path(app.template_folder).glob("*.html"))
+    sources += sorted(
+        fp for fp in Path(app.static_folder).rglob("*")
+        if fp.is_file() and not fp.name.endswith((".gz", ".br"))
     )
-    row = query.fetchone()
-    if row:
-        recipe_name = row[0]
-        source_url  = row[1] if row[1] is not None else ""
-    else:
-        recipe_name = "???"
-        source_url  = ""
+    fingerprint = ";".join(f"{fp.name}:{fp.stat().st_mtime_ns}" for fp in sources)
 
-    ## Get the Ingredients
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:12]
+
+
+RESPONSE_VERSION = get_response_version()
+
+
+def conditional_get(*meta_keys, per_day=False):
+    """
+    Answer conditional GETs for a view whose output only depends on its
+    url and the given catalog_meta versions (and today's date if per_day).
+
+    The ETag and Last-Modified validators come from a single catalog_meta
+    lookup, so a matching If-None-Match returns 304 before the view runs
+    any other query or renders a template. If-Modified-Since is not
+    honored: Last-Modified only has one-second granularity and leaves out
+    RESPONSE_VERSION, so only the ETag is precise enough.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            db = get_db()
+            meta_values = dbt.get_meta_values(db.cursor(), meta_keys)
+            g._meta_values = meta_values
+
+            tag_parts = [RESPONSE_VERSION, request.full_path]
+            tag_parts.extend(f"{key}={meta_values[key][0]}" for key in meta_keys)
+            if per_day:
+                tag_parts.append(get_today_date())
+            etag = hashlib.sha1("|".join(tag_parts).encode()).hexdigest()
+
+            updated_at = [ts for _, ts in meta_values.values() if ts is not None]
+            last_modified = (
+                datetime.fromtimestamp(max(updated_at), tz=timezone.utc)
+                if updated_at and not per_day else None
+            )
+
+            # weak comparison, since compressed responses carry W/ tags
+            not_modified = bool(request.if_none_match) and request.if_none_match.contains_weak(etag)
+
+            if not_modified:
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+
+            # let clients keep a copy, but have them revalidate every time
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers["Cache-Control"] = "private, no-cache"
+
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def populate_recipe_list(prefix: str = "", after_name: str = "", after_id: int = 0, limit: int = DEFAULT_PICKER_LIMIT):
+    """
+    Return one page of recipes whose names start with `prefix` (ignoring
+    case), ordered by name then id and starting after the (after_name,
+    after_id) cursor, along with the cursor of the next page (None on the
+    last one). Served from recipes_name_nocase_idx, so the cost of a page
+    does not grow with the catalog.
+    """
+    db = get_catalog_db(row_factory=None)
+    cur = db.cursor()
     query = cur.execute('''
-        SELECT
-           ingredient
-        FROM ingredients
-        WHERE recipe_id = ?
-        ORDER BY ingredient_number
-        ;
-        ''',
-        (recipe_id,)
-    )
+    SELECT
+       recipe_id
+      ,recipe_name
+    FROM recipes
+    WHERE recipe_name >= :prefix COLLATE NOCASE
+      AND recipe_name < :prefix_end COLLATE NOCASE
+      AND (recipe_name COLLATE NOCASE, recipe_id) > (:after_name, :after_id)
+    ORDER BY recipe_name COLLATE NOCASE, recipe_id
+    LIMIT :limit;
+    ''', dict(
+        prefix=prefix,
+        prefix_end=prefix + "\U0010ffff",
+        after_name=after_name,
+        after_id=after_id,
+        limit=limit + 1,
+    ))
+
+    # fetch one extra row to learn whether there is another page
     rows = query.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = dict(after_name=rows[-1][1], after_id=rows[-1][0]) if has_more else None
+
+    return [dict(zip(RECIPE_LIST_COLUMNS, row)) for row in rows], next_cursor
+
 
-    # convert values
-    columns = [desc[0] for desc in cur.description]
-    ingredient_rslt = dict([(c, [row[c] for row in rows]) for c in columns])
+def search_recipe_names(query: str, after_name: str = "", after_id: int = 0, limit: int = DEFAULT_PICKER_LIMIT):
+    """
+    Like populate_recipe_list, but for recipes with a name word starting
+    with each word of `query` (so "chicken" finds "Spicy Chicken Curry"),
+    answered from recipe_name_index.
+    """
+    matches = recipe_name_index.search(query.split(" "))
+    if after_name or after_id:
+        cursor = (after_name.lower(), after_id)
+        matches = [m for m in matches if (m[1].lower(), m[0]) > cursor]
+
+    has_more = len(matches) > limit
+    matches = matches[:limit]
+    next_cursor = dict(after_name=matches[-1][1], after_id=matches[-1][0]) if has_more else None
+
+    return [dict(zip(RECIPE_LIST_COLUMNS, row)) for row in matches], next_cursor
+
+
+def fetch_recipes(recipe_ids):
+    """
+    Return {recipe_id: recipe dict} for the given ids in a single query,
+    with each recipe's ingredients and directions aggregated as JSON arrays.
+    """
+    db = get_catalog_db(row_factory=dict_factory)
+    cur = db.cursor()
 
-    ## Get the Directions
     query = cur.execute('''
         SELECT
-           direction
-        FROM directions
-        WHERE recipe_id = ?
-        ORDER BY direction_number
+           r.recipe_id
+          ,r.recipe_name
+          ,r.source_url
+          ,r.prep_time
+          ,r.cook_time
+          ,r.servings
+          ,(SELECT json_group_array(ingredient) FROM (
+              SELECT ingredient FROM ingredients
+              WHERE recipe_id = r.recipe_id
+              ORDER BY ingredient_number)) AS ingredients
+          ,(SELECT json_group_array(direction) FROM (
+              SELECT direction FROM directions
+              WHERE recipe_id = r.recipe_id
+              ORDER BY direction_number)) AS directions
+        FROM recipes AS r
+        WHERE r.recipe_id IN (SELECT value FROM json_each(?))
         ;
         ''',
-        (recipe_id,)
+        (json.dumps(list(recipe_ids)),)
     )
-    rows = query.fetchall()
 
-    # convert values
-    columns = [desc[0] for desc in cur.description]
-    direction_rslt = dict([(c, [row[c] for row in rows]) for c in columns])
+    recipes = dict()
+    for row in query.fetchall():
+        row['ingredients'] = json.loads(row['ingredients'])
+        row['directions'] = json.loads(row['directions'])
+        row['source_url'] = row['source_url'] if row['source_url'] is not None else ""
+        recipes[row['recipe_id']] = row
+
+    return recipes
+
+
+def parse_recipe_ids(recipe_ids):
+    """
+    Parse a comma separated list of recipe ids, skipping bad entries and
+    repeats but keeping the original order.
+    """
+    parsed = []
+    for rid in recipe_ids.split(","):
+        try:
+            rid = int(rid)
+        except ValueError:
+            continue
+        if rid not in parsed:
+            parsed.append(rid)
+
+    return parsed
+
+
+def get_recipe(recipe_id):
+    try:
+        recipe_id = int(recipe_id)
+    except (TypeError, ValueError):
+        recipe_id = None
+
+    recipe = fetch_recipes([recipe_id]).get(recipe_id) if recipe_id is not None else None
+    if recipe is None:
+        recipe = dict(recipe_name="???", ingredients=[], directions=[], source_url="")
 
     rslt = dict(
-        recipe_name = recipe_name,
-        ingredients = ingredient_rslt['ingredient'],
-        directions = direction_rslt['direction'],
-        source_url = source_url
+        recipe_name = recipe['recipe_name'],
+        ingredients = recipe['ingredients'],
+        directions = recipe['directions'],
+        source_url = recipe['source_url']
     )
 
     return rslt
 
 
-def get_todays_recipe_id():
-    ymd_date_str = datetime.now().strftime("%Y-%m-%d")
+def get_similar_recipes(recipe_id, limit=SIMILAR_RECIPES_SHOWN):
+    """
+    Return the recipes most like recipe_id, best first, as precomputed by
+    similar.py.
+    """
+    db = get_catalog_db(row_factory=dict_factory)
+    cur = db.cursor()
 
-    return get_days_recipe_id(ymd_date_str)
+    query = cur.execute('''
+        SELECT
+           n.neighbor_id AS recipe_id
+          ,r.recipe_name
+        FROM recipe_neighbors AS n
+        INNER JOIN recipes AS r
+          ON r.recipe_id = n.neighbor_id
+        WHERE n.recipe_id = ?
+        ORDER BY n.rank
+        LIMIT ?
+        ;
+        ''',
+        (recipe_id, limit)
+    )
+
+    return query.fetchall()
+
+
+def get_todays_recipe_id():
+    # the same clock as the per_day ETag in conditional_get
+    return get_days_recipe_id(get_today_date())
 
 
 def get_days_recipe_id(ymd_date):
@@ -200,51 +506,97 @@ def get_weekly_schedule(week_start):
     return rows
 
 
+# recipe_stats columns ordering each top-recipes sort key; the last
+# column breaks ties so every row has a unique position for keyset paging
+TOP_RECIPE_SORT_COLUMNS = {
+    "name": ("recipe_name", "times_cooked", "recipe_id"),
+    "times": ("times_cooked", "last_cooked", "recipe_id"),
+    "last": ("last_cooked", "times_cooked", "recipe_id"),
+}
+
+
+def encode_page_cursor(row, sort_key):
+    """
+    Encode a row's sort-key values as an opaque, url-safe page cursor.
+    """
+    values = [row[col] for col in TOP_RECIPE_SORT_COLUMNS[sort_key]]
+
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_page_cursor(cursor):
+    if not cursor:
+        return None
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+
+    return values if isinstance(values, list) and len(values) == 3 else None
+
+
 def get_top_scheduled_recipes(
     limit: int,
-    offset: int = 0,
     sort_key: str = "times",
     sort_direction: str = "desc",
+    after: list = None,
+    before: list = None,
 ):
     """
-    Return a page of the most frequently scheduled recipes.
-    Aggregates over the recipe_schedule table and joins recipe names.
+    Return a page of the most frequently scheduled recipes from the
+    recipe_stats rollup, starting after (or ending before) the given
+    sort-key values, plus whether more rows exist beyond the page.
     """
     # Map requested sort key/direction to safe SQL fragments
-    if sort_key not in {"name", "times", "last"}:
+    if sort_key not in TOP_RECIPE_SORT_COLUMNS:
         sort_key = "times"
 
     sort_direction = sort_direction.lower()
     if sort_direction not in {"asc", "desc"}:
         sort_direction = "desc"
 
-    if sort_key == "name":
-        order_clause = f"r.recipe_name {sort_direction.upper()}, times_cooked DESC"
-    elif sort_key == "last":
-        order_clause = f"last_cooked {sort_direction.upper()}, times_cooked DESC"
+    # walking backwards from `before` flips the scan direction
+    backwards = before is not None and after is None
+    scan_direction = sort_direction
+    if backwards:
+        scan_direction = "asc" if sort_direction == "desc" else "desc"
+
+    columns = TOP_RECIPE_SORT_COLUMNS[sort_key]
+    order_clause = ", ".join(f"{col} {scan_direction.upper()}" for col in columns)
+
+    cursor_values = before if backwards else after
+    if cursor_values is not None:
+        comparison = ">" if scan_direction == "asc" else "<"
+        where_clause = f"WHERE ({', '.join(columns)}) {comparison} (?, ?, ?)"
+        params = tuple(cursor_values)
     else:
-        # default: sort by times cooked
-        order_clause = f"times_cooked {sort_direction.upper()}, last_cooked DESC"
+        where_clause = ""
+        params = ()
 
     db = get_db(row_factory=dict_factory)
     cur = db.cursor()
     query = f'''
         SELECT
-           rs.recipe_id
-          ,r.recipe_name
-          ,SUM(COALESCE(rs.quantity, 1)) AS times_cooked
-          ,MAX(rs.scheduled_day)         AS last_cooked
-        FROM recipe_schedule AS rs
-        LEFT JOIN recipes AS r
-          ON rs.recipe_id = r.recipe_id
-        GROUP BY rs.recipe_id, r.recipe_name
+           recipe_id
+          ,recipe_name
+          ,times_cooked
+          ,last_cooked
+        FROM recipe_stats
+        {where_clause}
         ORDER BY {order_clause}
-        LIMIT ? OFFSET ?
+        LIMIT ?
     '''
-    cur.execute(query, (limit, offset))
+    # one extra row tells us whether there is another page
+    cur.execute(query, params + (limit + 1,))
     rows = cur.fetchall()
 
-    return rows
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    return rows, has_more
 
 
 def get_scheduled_recipe_count() -> int:
@@ -255,8 +607,8 @@ def get_scheduled_recipe_count() -> int:
     cur = db.cursor()
     cur.execute(
         '''
-        SELECT COUNT(DISTINCT recipe_id) AS total_recipes
-        FROM recipe_schedule
+        SELECT COUNT(*) AS total_recipes
+        FROM recipe_stats
         '''
     )
     row = cur.fetchone()
@@ -269,46 +621,308 @@ def favicon():
    return send_from_directory(app.static_folder, 'favicon.ico')
 
 
+@app.before_request
+def start_request_timer():
+    g._request_start = time.perf_counter()
+    g._query_stats = metrics.QueryStats()
+    g._query_stats_token = metrics.current_query_stats.set(g._query_stats)
+
+
+@app.after_request
+def record_response_status(response):
+    request.environ["recipe_site.status"] = response.status_code
+    return response
+
+
+@app.teardown_request
+def record_request_metrics(exception):
+    start = g.pop('_request_start', None)
+    if start is None:
+        return
+
+    # label by url rule, not path, to keep the number of series bounded
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    # a stream closed early by the client ends in GeneratorExit; the status
+    # it was sent with still stands
+    status = request.environ.get("recipe_site.status", 500)
+    if exception is not None and not isinstance(exception, GeneratorExit):
+        status = 500
+    request_metrics.observe_request(
+        route, request.method, status, time.perf_counter() - start, g._query_stats
+    )
+    try:
+        metrics.current_query_stats.reset(g.pop('_query_stats_token'))
+    except ValueError:
+        # torn down from another context, e.g. at the end of a stream
+        metrics.current_query_stats.set(None)
+
+
 @app.teardown_appcontext
 def close_connection(exception):
-    db = getattr(g, '_database', None)
+    db = g.pop('_catalog_database', None)
+    if db is not None:
+        catalog_replica.checkin(db)
+
+    db = g.pop('_database', None)
     if db is not None:
-        db.close()
+        db_pool.checkin(db)
+
+    db = g.pop('_write_database', None)
+    if db is not None:
+        db_pool.checkin_write(db)
+
+
+@app.route('/recipe-site/db-health', methods=['GET'])
+def db_health():
+    health = db_pool.health()
+    status = 200 if health["ok"] else 503
+
+    return health, status
+
+
+@app.route('/recipe-site/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Request and SQL metrics for this worker process, in the Prometheus
+    text format.
+    """
+    gauges = {
+        f"db_pool_{key}": value for key, value in db_pool.stats().items() if key != "pid"
+    }
+    gauges.update({
+        f"recipe_page_cache_{key}": value
+        for key, value in recipe_page_cache.stats().items() if key != "generation"
+    })
+    if catalog_replica is not None:
+        gauges.update({
+            f"catalog_replica_{key}": value for key, value in catalog_replica.stats().items()
+        })
+
+    response = make_response(request_metrics.render(gauges))
+    response.mimetype = "text/plain"
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+
+    return response
+
+
+@app.route('/recipe-site/debug/slow-queries', methods=['GET'])
+def slow_queries():
+    """
+    The slowest recent statements in this worker, with their query plans.
+    """
+    if slow_query_log is None:
+        return dict(error="slow query log is off; set RECIPE_SITE_SLOW_QUERY_MS"), 404
+
+    return dict(stats=slow_query_log.stats(), queries=slow_query_log.entries())
 
 
 @app.route('/recipe-site/recipe-search', methods=['GET'])
 def recipe_search():
-    search_terms = request.args.get('search-terms')
+    search_terms = request.args.get('search-terms', default='')
     search_terms = search_terms.split(" ")
 
-    db = get_db(row_factory=dict_factory)
+    # how many results?
+    try:
+        limit = int(request.args.get('limit', default=DEFAULT_SEARCH_LIMIT))
+    except (TypeError, ValueError):
+        limit = DEFAULT_SEARCH_LIMIT
+    if limit <= 0 or limit > MAX_SEARCH_LIMIT:
+        limit = MAX_SEARCH_LIMIT
+
+    # which fields to search? (name, ingredients, directions)
+    fields = request.args.get('fields', default='name')
+    fields = [f.strip() for f in fields.split(",") if f.strip() in apdb.SEARCH_FIELDS]
+
+    # name-only autocomplete is answered from memory
+    if fields in ([], ["name"]):
+        return [
+            dict(recipe_id=recipe_id, recipe_name=recipe_name)
+            for recipe_id, recipe_name in recipe_name_index.search(search_terms, limit)
+        ]
+
+    db = get_catalog_db(row_factory=dict_factory)
     cur = db.cursor()
-    rows, _ = apdb.search_recipe_list(cur, search_terms)
+    rows, _ = apdb.search_recipe_list(cur, search_terms, limit=limit, fields=fields)
 
     # get data
     return rows
 
 
+@app.route('/recipe-site/ingredient-search', methods=['GET'])
+@conditional_get("catalog_version")
+def ingredient_search():
+    """
+    "Cook with what I have": recipes using every ingredient in
+    `ingredients` and ideally those in `optional` (both comma separated),
+    best coverage of the optional ones first.
+    """
+    required = [i.strip() for i in request.args.get('ingredients', default='').split(",") if i.strip()]
+    optional = [i.strip() for i in request.args.get('optional', default='').split(",") if i.strip()]
+    if not required and not optional:
+        return dict(error="give at least one of ingredients or optional"), 400
+
+    try:
+        limit = int(request.args.get('limit', default=DEFAULT_SEARCH_LIMIT))
+    except (TypeError, ValueError):
+        limit = DEFAULT_SEARCH_LIMIT
+    if limit <= 0 or limit > MAX_SEARCH_LIMIT:
+        limit = MAX_SEARCH_LIMIT
+
+    db = get_catalog_db(row_factory=None)
+    results, n_matches, unknown = apdb.search_by_ingredients(
+        db.cursor(), required, optional, limit=limit
+    )
+
+    return dict(recipes=results, total=n_matches, unknown=unknown)
+
+
+def iter_recipe_list_json(columns: bool = False, batch_size: int = 500):
+    """
+    Yield the whole recipe list as JSON text, a batch of rows at a time, so
+    the catalog is never held in memory at once.
+    """
+    db = get_db(row_factory=None)
+    cur = db.cursor()
+
+    if not columns:
+        query = cur.execute('''
+        SELECT
+           recipe_id
+          ,recipe_name
+        FROM recipes
+        ORDER BY recipe_id;
+        ''')
+        sep = "["
+        while rows := query.fetchmany(batch_size):
+            yield sep + ",".join(
+                json.dumps(dict(recipe_id=rid, recipe_name=name), separators=(",", ":"))
+                for rid, name in rows
+            )
+            sep = ","
+        yield "[]" if sep == "[" else "]"
+        return
+
+    # one pass per column, inside a single read transaction so both
+    # arrays come from the same snapshot
+    cur.execute("BEGIN")
+    for i, column in enumerate(RECIPE_LIST_COLUMNS):
+        query = cur.execute(f"SELECT {column} FROM recipes ORDER BY recipe_id;")
+        yield ("{" if i == 0 else "],") + json.dumps(column) + ":["
+        sep = ""
+        while rows := query.fetchmany(batch_size):
+            yield sep + ",".join(json.dumps(row[0]) for row in rows)
+            sep = ","
+    yield "]}"
+    db.rollback()
+
+
 @app.route('/recipe-site/recipe-list.json', methods=['GET'])
+@conditional_get("catalog_version")
 def recipe_lister():
-    db = get_db(row_factory=dict_factory)
+    """
+    List recipe ids and names, ordered by id.
+
+    With `limit`, return one page of the rows after `after_id` plus the
+    `next_after_id` to continue from (null on the last page). Without it,
+    stream the whole list. `format=columns` returns parallel arrays instead
+    of a list of objects.
+    """
+    columns = request.args.get('format') == 'columns'
+
+    if 'limit' not in request.args:
+        return app.response_class(
+            stream_with_context(iter_recipe_list_json(columns=columns)),
+            mimetype="application/json"
+        )
+
+    try:
+        limit = int(request.args.get('limit'))
+        after_id = int(request.args.get('after_id', default=0))
+    except ValueError:
+        return dict(error="limit and after_id must be integers"), 400
+    if limit <= 0 or limit > MAX_RECIPE_LIST_LIMIT:
+        limit = MAX_RECIPE_LIST_LIMIT
+
+    db = get_db(row_factory=None)
     cur = db.cursor()
     query = cur.execute('''
     SELECT
        recipe_id
       ,recipe_name
-    FROM recipes;
-    ''')
+    FROM recipes
+    WHERE recipe_id > ?
+    ORDER BY recipe_id
+    LIMIT ?;
+    ''', (after_id, limit + 1))
 
-    # get data
+    # fetch one extra row to learn whether there is another page
     rows = query.fetchall()
-    return rows
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_after_id = rows[-1][0] if has_more else None
+
+    if columns:
+        page = {
+            column: [row[i] for row in rows]
+            for i, column in enumerate(RECIPE_LIST_COLUMNS)
+        }
+    else:
+        page = dict(recipes=[dict(zip(RECIPE_LIST_COLUMNS, row)) for row in rows])
+    page["next_after_id"] = next_after_id
+
+    return page
+
+
+@app.route('/recipe-site/recipe-picker.json', methods=['GET'])
+@conditional_get("catalog_version")
+def recipe_picker():
+    """
+    One page of recipes for the recipe pickers, ordered by name, after the
+    `after_name`/`after_id` cursor: names with words starting with the
+    words typed in `q`, or else names starting with `prefix` (browsing the
+    whole catalog if empty). Returns the page and `next`, the cursor to
+    continue from (null on the last page).
+    """
+    query = request.args.get('q', default='').strip()
+    prefix = request.args.get('prefix', default='').strip()
+    after_name = request.args.get('after_name', default='')
+
+    try:
+        limit = int(request.args.get('limit', default=DEFAULT_PICKER_LIMIT))
+        after_id = int(request.args.get('after_id', default=0))
+    except ValueError:
+        return dict(error="limit and after_id must be integers"), 400
+    if limit <= 0 or limit > MAX_PICKER_LIMIT:
+        limit = MAX_PICKER_LIMIT
+
+    if query:
+        recipes, next_cursor = search_recipe_names(query, after_name, after_id, limit)
+    else:
+        recipes, next_cursor = populate_recipe_list(prefix, after_name, after_id, limit)
+
+    return dict(recipes=recipes, next=next_cursor)
+
+
+@app.route('/recipe-site/recipes.json', methods=['GET'])
+@conditional_get("catalog_version")
+def recipes_lister():
+    """
+    Return fully hydrated recipes for `ids` (comma separated), in request
+    order, using one query regardless of how many are asked for.
+    """
+    recipe_ids = parse_recipe_ids(request.args.get('ids', default=''))
+    if len(recipe_ids) > MAX_BATCH_RECIPES:
+        return dict(error=f"at most {MAX_BATCH_RECIPES} ids per request"), 400
+
+    recipes = fetch_recipes(recipe_ids)
+
+    return [recipes[rid] for rid in recipe_ids if rid in recipes]
 
 
 @app.route('/recipe-site')
 @app.route('/recipe-site/')
+@conditional_get("catalog_version", "schedule_version", per_day=True)
 def recipe_site():
-    recipe_data = populate_recipe_list()
     todays_recipe_id = get_todays_recipe_id()
     week_start = get_current_week_start()
     weekly_schedule = get_weekly_schedule(week_start)
@@ -317,8 +931,6 @@ def recipe_site():
     return render_template(
         'index.html',
         todays_recipe_id = todays_recipe_id,
-        recipe_id        = recipe_data['recipe_id'],
-        recipe_name      = recipe_data['recipe_name'],
         week_start       = week_start,
         weekly_schedule  = weekly_schedule,
         weekdays         = WEEKDAYS,
@@ -327,7 +939,12 @@ def recipe_site():
 
 
 @app.route('/recipe-site/recipe/<recipe_id>')
+@conditional_get("catalog_version")
 def render_recipe(recipe_id):
+    return get_recipe_page(recipe_id)
+
+
+def render_recipe_page(recipe_id):
     recipe_data = get_recipe(recipe_id)
 
     return render_template(
@@ -335,19 +952,52 @@ def render_recipe(recipe_id):
         recipe_name=recipe_data['recipe_name'],
         ingredients=recipe_data['ingredients'],
         directions=recipe_data['directions'],
-        source_url=recipe_data['source_url']
+        source_url=recipe_data['source_url'],
+        similar_recipes=get_similar_recipes(recipe_id)
     )
 
 
+def get_recipe_page(recipe_id):
+    """
+    Return the rendered recipe page, from recipe_page_cache when possible.
+    Entries are keyed by catalog version, so re-ingesting invalidates them.
+    """
+    catalog_version = get_meta_version("catalog_version")
+    recipe_page_cache.set_generation(catalog_version)
+
+    cache_key = (str(recipe_id), catalog_version)
+    page = recipe_page_cache.get(cache_key)
+    if page is None:
+        page = render_recipe_page(recipe_id)
+        recipe_page_cache.put(cache_key, page, size=len(page.encode()))
+
+    return page
+
+
+def warm_recipe_page_cache(week_start=None):
+    """
+    Render this week's scheduled recipes into recipe_page_cache.
+    Must be called within an app context.
+    """
+    if week_start is None:
+        week_start = get_current_week_start()
+
+    recipe_ids = {row['recipe_id'] for row in get_weekly_schedule(week_start)}
+    for recipe_id in sorted(recipe_ids):
+        get_recipe_page(recipe_id)
+
+    return len(recipe_ids)
+
+
+@app.route('/recipe-site/cache-stats', methods=['GET'])
+def cache_stats():
+    return dict(recipe_pages=recipe_page_cache.stats())
+
+
 @app.route('/recipe-site/grocery-list/')
+@conditional_get("catalog_version")
 def render_grocery():
-    recipe_data = populate_recipe_list()
-
-    return render_template(
-        'grocery-list.html',
-        recipe_id=recipe_data['recipe_id'],
-        recipe_name=recipe_data['recipe_name']
-    )
+    return render_template('grocery-list.html')
 
 
 @app.route('/recipe-site/grocery-list-print/', methods=['GET'])
@@ -366,46 +1016,57 @@ def render_grocery_print():
     else:
         recipe_quantities = ['1' for _ in recipe_ids]
 
-    # filter the lists
-    recipe_ids, recipe_quantities = zip(
-       *((rid, amt) for rid, amt in zip(recipe_ids, recipe_quantities)
-         if rid != "" and amt != "" and int(amt) > 0)
-    )
-
-    # conver to ints
-    recipe_ids = [int(idx) for idx in recipe_ids]
-    recipe_quantities = [int(n) for n in recipe_quantities]
-
-    # convert to map
-    recipe_amt_map = {idx: amt for (idx, amt) in zip(recipe_ids, recipe_quantities)}
-
-    # fetch the recipes
+    # filter the lists, summing repeated recipes
+    recipe_amt_map = dict()
+    for rid, amt in zip(recipe_ids, recipe_quantities):
+        try:
+            rid, amt = int(rid), int(amt)
+        except ValueError:
+            continue
+        if amt > 0:
+            recipe_amt_map[rid] = recipe_amt_map.get(rid, 0) + amt
+
+    # aggregate the parsed ingredients across recipes, scaled by quantity;
+    # lines without an amount are grouped by item and counted instead
     db = get_db()
     cur = db.cursor()
     query = cur.execute(
-        f"""
-            SELECT
-              recipe_id,
-              ingredient
-            FROM ingredients
-            WHERE recipe_id in ({','.join(['?']*len(recipe_ids))})
+        """
+        WITH wanted AS (
+          SELECT
+             CAST(key AS INTEGER) AS recipe_id
+            ,value                AS multiplier
+          FROM json_each(?)
+        )
+        SELECT
+           i.item
+          ,i.unit
+          ,SUM(i.quantity * w.multiplier) AS quantity
+          ,SUM(w.multiplier)              AS times
+          ,MIN(i.ingredient)              AS ingredient
+        FROM ingredients AS i
+        INNER JOIN wanted AS w
+          ON i.recipe_id = w.recipe_id
+        GROUP BY
+           i.quantity IS NULL
+          ,COALESCE(i.item, i.ingredient)
+          ,i.unit
+        ORDER BY MIN(i.recipe_id), MIN(i.ingredient_number)
         """,
-        recipe_ids
+        (json.dumps(recipe_amt_map),)
     )
-    rows = query.fetchall()
-
-    # convert values
-    columns = [desc[0] for desc in cur.description]
-    column_vals = dict([(c, [row[c] for row in rows]) for c in columns])
 
-    # multiplier for each ingredient?
-    ingredient_quantities = [recipe_amt_map[idx] for idx in column_vals['recipe_id']]
+    grocery_items = []
+    for row in query.fetchall():
+        if row['quantity'] is not None and row['item'] is not None:
+            line = describe_ingredient(row['quantity'], row['unit'], row['item'])
+            grocery_items.append((line, 1))
+        else:
+            grocery_items.append((row['item'] or row['ingredient'], row['times']))
 
     return render_template(
         'grocery-list-print.html',
-        # TODO: for now, send as a zip, because zips are hard(ish) with jinja
-        # later, we could just render on front end instead
-        ingredient_zip = zip(column_vals['ingredient'], ingredient_quantities)
+        grocery_items = grocery_items
     )
 
 
@@ -420,12 +1081,15 @@ def render_recipe_scheduler():
 def render_top_recipes():
     """
     Render a paginated table of the most frequently scheduled recipes.
-    The page size defaults to 10 recipes per page.
+    The page size defaults to 10 recipes per page; pages are addressed by
+    `after`/`before` cursors rather than offsets.
     """
     page_param = request.args.get('page', default='1')
     per_page_param = request.args.get('per_page', default='10')
     sort_key = request.args.get('sort', default='times')
     sort_direction = request.args.get('direction', default='desc')
+    after = decode_page_cursor(request.args.get('after'))
+    before = decode_page_cursor(request.args.get('before'))
 
     try:
         page = int(page_param)
@@ -437,7 +1101,12 @@ def render_top_recipes():
     except (TypeError, ValueError):
         per_page = 10
 
-    if page < 1:
+    if sort_key not in TOP_RECIPE_SORT_COLUMNS:
+        sort_key = 'times'
+    if sort_direction not in {'asc', 'desc'}:
+        sort_direction = 'desc'
+
+    if page < 1 or (after is None and before is None):
         page = 1
     if per_page <= 0:
         per_page = 10
@@ -448,21 +1117,30 @@ def render_top_recipes():
 
     if total_recipes > 0:
         total_pages = (total_recipes + per_page - 1) // per_page
-        if page > total_pages:
-            page = total_pages
-        offset = (page - 1) * per_page
-        top_recipes = get_top_scheduled_recipes(
+        top_recipes, has_more = get_top_scheduled_recipes(
             per_page,
-            offset,
             sort_key=sort_key,
             sort_direction=sort_direction,
+            after=after,
+            before=before,
         )
     else:
         total_pages = 1
-        top_recipes = []
+        top_recipes, has_more = [], False
+
+    if before is not None and after is None:
+        has_prev = has_more
+        has_next = True
+    else:
+        has_prev = after is not None
+        has_next = has_more
+
+    # walking back to the first page lands on a plain first-page url
+    if not has_prev:
+        page = 1
 
-    has_prev = page > 1
-    has_next = total_recipes > page * per_page
+    next_cursor = encode_page_cursor(top_recipes[-1], sort_key) if top_recipes else ''
+    prev_cursor = encode_page_cursor(top_recipes[0], sort_key) if top_recipes else ''
 
     return render_template(
         'top-recipes.html',
@@ -473,6 +1151,8 @@ def render_top_recipes():
         total_pages=total_pages,
         has_prev=has_prev,
         has_next=has_next,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
         sort_key=sort_key,
         sort_direction=sort_direction,
     )
@@ -502,82 +1182,168 @@ def recipes_scheduled():
     return rows
 
 
+def parse_schedule_args(args):
+    """
+    Parse the scheduler's query string (one week, as parallel comma
+    separated lists) into [(week_start, entries)], see parse_schedule_week.
+    """
+    week_start = args.get('week-start')
+    days_of_week = args.get('weekdays-scheduled')
+    recipe_ids = args.get('recipe-ids')
+    recipe_counts = args.get('recipe-counts')
+
+    logger.debug(
+        "Scheduling week %s: days=%s recipe_ids=%s counts=%s",
+        week_start, days_of_week, recipe_ids, recipe_counts
+    )
+
+    recipe_ids = [int(rid) if rid.strip() else -1 for rid in recipe_ids.split(",")]
+    recipe_counts = [int(amt) if amt.strip() else 0 for amt in recipe_counts.split(",")]
+    days_of_week = [int(day) if day.strip() else -1 for day in days_of_week.split(",")]
+
+    rows = [
+        dict(day_of_week=day, recipe_id=recipe_id, quantity=quantity)
+        for day, recipe_id, quantity in zip(days_of_week, recipe_ids, recipe_counts)
+    ]
+
+    return [parse_schedule_week(week_start, rows)]
+
+
+def parse_schedule_week(week_start, rows):
+    """
+    Validate one week of schedule rows (dicts with day_of_week, recipe_id
+    and quantity) into (week_start, {(day_of_week, recipe_id): quantity}).
+    Rows for the same day and recipe are summed; zero quantities drop out.
+    Raises ValueError on bad input.
+    """
+    datetime.strptime(week_start, "%Y-%m-%d")
+
+    entries = dict()
+    for row in rows:
+        day, recipe_id, quantity = int(row['day_of_week']), int(row['recipe_id']), int(row['quantity'])
+        if quantity < 0:
+            raise ValueError(f"bad schedule row {row}")
+        # an emptied week arrives as one blank row (day -1, quantity 0)
+        if quantity == 0:
+            continue
+        if not 0 <= day < 7:
+            raise ValueError(f"bad schedule row {row}")
+        entries[(day, recipe_id)] = entries.get((day, recipe_id), 0) + quantity
+
+    return week_start, entries
+
+
 @app.route('/recipe-site/recipe-scheduler/create-schedule', methods=['POST'])
 def schedule_recipes():
-    add_time = str(datetime.now())[0:23]
-    week_start = request.args.get('week-start')
-    days_of_week = request.args.get('weekdays-scheduled')
-    recipe_ids = request.args.get('recipe-ids')
-    recipe_counts = request.args.get('recipe-counts')
+    """
+    Save scheduled weeks, writing only the rows that changed.
 
-    print(week_start)
-    print(days_of_week)
-    print(recipe_ids)
-    print(recipe_counts)
+    The scheduler page sends one week in the query string. A JSON body
+    {"weeks": [{"week_start": ..., "entries": [{"day_of_week": ...,
+    "recipe_id": ..., "quantity": ...}, ...]}, ...]} saves many weeks in
+    one transaction; each listed week is replaced by its entries.
+    """
+    add_time = str(datetime.now())[0:23]
+    as_json = request.is_json
 
     try:
-        recipe_ids = recipe_ids.split(",")
-        recipe_ids = [int(rid) if rid.strip() else -1 for rid in recipe_ids]
-    except:
+        if as_json:
+            weeks = [
+                parse_schedule_week(week['week_start'], week.get('entries', []))
+                for week in request.get_json()['weeks']
+            ]
+        else:
+            weeks = parse_schedule_args(request.args)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        if as_json:
+            return dict(result="schedule-failure"), 400
         return "schedule-failure"
 
+    # take the write lock up front, so the diff is computed against the rows
+    # that are actually there when we write
+    db = begin_write()
+    c  = db.cursor()
     try:
-        recipe_counts = recipe_counts.split(",")
-        recipe_counts = [int(amt) if amt.strip() else 0 for amt in recipe_counts]
+        affected_ids = set()
+        for week_start, entries in weeks:
+            logger.debug("Schedule entries for %s: %s", week_start, entries)
+            affected_ids |= dbt.sync_schedule_week(c, week_start, entries, add_time)
+
+        if affected_ids:
+            # keep the top-recipes rollup current
+            dbt.refresh_recipe_stats(c, affected_ids)
+
+            # invalidate cached schedule views
+            dbt.bump_meta_value(c, "schedule_version")
+        db.commit()
     except:
-        return "schedule-failure"
+        db.rollback()
+        raise
 
-    try:
-        days_of_week = days_of_week.split(",")
-        days_of_week = [int(weekday) if weekday.strip() else -1 for weekday in days_of_week]
-    except:
-        return "schedule-failure"
+    if as_json:
+        return dict(result="schedule-success", weeks=len(weeks), changed_recipes=len(affected_ids))
+    return "schedule-success"
 
-    # delete records
-    db = get_db()
-    c  = db.cursor()
-    query = c.execute('''
-        DELETE FROM recipe_schedule
-        WHERE week_start = ?
-        ''',
-        (week_start,)
-    )
 
-    print("HERE")
-    # insert records
-    #keep_days = [i for i in range(7) if recipe_ids[i] >= 0 and recipe_counts[i] != 0]
-    scheduled_days = [
-        (datetime.strptime(week_start, "%Y-%m-%d") + timedelta(days = i)).strftime("%Y-%m-%d")
-        for i in days_of_week #keep_days
-    ]
-    # recipe_ids = [recipe_ids[i] for i in keep_days]
-    # recipe_counts = [recipe_counts[i] for i in keep_days]
-    records = [
-        (week_start, scheduled_day, day_of_week, recipe_id, quantity, add_time) for
-        day_of_week, scheduled_day, recipe_id, quantity
-        in zip(days_of_week, scheduled_days, recipe_ids, recipe_counts)
-        if quantity > 0
-    ]
-    print(records)
-    query = c.executemany('''
-        INSERT INTO
-        recipe_schedule (
-             week_start
-           , scheduled_day
-           , day_of_week
-           , recipe_id
-           , quantity
-           , added_datetime
-        )
-        VALUES (?,?,?,?,?,?)
-        ''',
-        records
-    )
-    db.commit()
+# content hashes of static assets, for cache-busting urls and ETags
+static_hashes = compression.StaticHashes(app.static_folder)
+
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+
+@app.template_global()
+def static_url(path):
+    """
+    Url of a static asset, versioned by its content hash so it can be
+    cached indefinitely.
+    """
+    url = f"/recipe-site/static/{path}"
+    content_hash = static_hashes.get(path)
+    if content_hash is not None:
+        url += f"?v={content_hash}"
+
+    return url
 
-    return "schedule-success"
+
+@app.after_request
+def compress_response(response):
+    return compression.compress_response(response, request.accept_encodings)
 
 
 @app.route('/recipe-site/static/<path:path>')
 def send_js(path):
-    return send_from_directory(app.static_folder, path)
+    content_hash = static_hashes.get(path)
+    if content_hash is None:
+        return send_from_directory(app.static_folder, path)
+
+    # serve a precompressed sibling (see precompress.py) when there is one
+    fp = os.path.join(app.static_folder, path)
+    sibling, encoding = compression.find_precompressed(fp, request.accept_encodings)
+
+    # immutable when requested through a static_url() with the current hash
+    versioned = request.args.get("v") == content_hash
+    response = send_from_directory(
+        app.static_folder,
+        os.path.relpath(sibling, app.static_folder) if sibling else path,
+        mimetype=mimetypes.guess_type(path)[0],
+        etag=f"{content_hash}-{encoding}" if encoding else content_hash,
+        max_age=STATIC_MAX_AGE if versioned else None,
+    )
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    if versioned:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+
+    return response
+
+
+# optionally fill the recipe page cache before serving (e.g. in the uwsgi
+# master, so forked workers start warm)
+if os.environ.get("RECIPE_SITE_WARM_CACHE"):
+    with app.app_context():
+        n_warmed = warm_recipe_page_cache()
+        logger.info("Warmed %d recipe pages", n_warmed)
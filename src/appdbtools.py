@@ -1,31 +1,218 @@
+from bisect import bisect_left
+from collections import Counter
+import heapq
+import json
 import sqlite3
+import dbtools as dbt
+from ingredients import ingredient_terms, normalize_item
 
 
-def search_recipe_list(cur:sqlite3.Cursor, search_terms:list[str]):
-    query_str = '''
-    SELECT
-       recipe_id
-      ,recipe_name
-    FROM recipes
-    '''
+# searchable columns of the recipe_search full-text index
+SEARCH_FIELDS = {
+    "name": "recipe_name",
+    "ingredients": "ingredients",
+    "directions": "directions",
+}
 
-    # append search terms
-    for (i, _) in enumerate(search_terms):
-        if i == 0:
-          query_str = query_str + "WHERE recipe_name LIKE ?\n"
-        else:
-          query_str = query_str + "  AND recipe_name LIKE ?\n"
-    query_str = query_str + ";"
-    print(query_str)
 
-    # get data
+def build_match_expression(search_terms:list[str], fields:list[str]):
+    """
+    Build an FTS5 MATCH expression requiring a prefix match on every term
+    within the requested fields.
+    """
+    # quote each term so punctuation is not parsed as FTS5 syntax
+    terms = ['"' + term.replace('"', '""') + '"*' for term in search_terms]
+    columns = " ".join(SEARCH_FIELDS[f] for f in fields)
+
+    return "{" + columns + "}: (" + " AND ".join(terms) + ")"
+
+
+def search_recipe_list(
+    cur:sqlite3.Cursor,
+    search_terms:list[str],
+    limit:int=None,
+    fields:list[str]=None,
+):
+    search_terms = [term for term in search_terms if term.strip()]
+    if not fields:
+        fields = ["name"]
+
     if search_terms:
-        query = cur.execute(query_str, tuple(['%'+term+'%' for term in search_terms]))
+        # ranked by bm25, weighting name matches above ingredients/directions
+        query_str = '''
+        SELECT
+           rs.rowid AS recipe_id
+          ,r.recipe_name
+        FROM recipe_search AS rs
+        INNER JOIN recipes AS r
+          ON r.recipe_id = rs.rowid
+        WHERE recipe_search MATCH ?
+        ORDER BY bm25(recipe_search, 10.0, 2.0, 1.0), r.recipe_name
+        LIMIT ?
+        ;
+        '''
+        params = (build_match_expression(search_terms, fields), limit if limit else -1)
     else:
-        query = cur.execute(query_str)
+        query_str = '''
+        SELECT
+           recipe_id
+          ,recipe_name
+        FROM recipes
+        LIMIT ?
+        ;
+        '''
+        params = (limit if limit else -1,)
+
+    # get data
+    query = cur.execute(query_str, params)
     rows = query.fetchall()
 
     # get column names
     columns = [desc[0] for desc in cur.description]
 
     return rows, columns
+
+
+def intersect_sorted(a, b):
+    """
+    Intersect two sorted id sequences, keeping the order. When one is much
+    shorter, its ids are binary-searched in the other instead of hashing
+    the longer one.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    if not a:
+        return []
+
+    if len(a) * 16 < len(b):
+        matched = []
+        lo = 0
+        for rid in a:
+            lo = bisect_left(b, rid, lo)
+            if lo == len(b):
+                break
+            if b[lo] == rid:
+                matched.append(rid)
+        return matched
+
+    b_ids = set(b)
+    return [rid for rid in a if rid in b_ids]
+
+
+def contains_sorted(ids, rid):
+    i = bisect_left(ids, rid)
+
+    return i < len(ids) and ids[i] == rid
+
+
+def lookup_ingredient(cur:sqlite3.Cursor, text:str):
+    """
+    Return the sorted ids of recipes using an ingredient, or None if it is
+    not in the index. "Olive oil" matches the item itself if indexed,
+    otherwise every recipe with both an "olive" and an "oil" item.
+    """
+    item = normalize_item(text)
+    if not item:
+        return None
+
+    terms = [item] + sorted(ingredient_terms(item) - {item})
+    cur.execute(
+        "SELECT term, recipe_ids FROM ingredient_terms WHERE term IN (SELECT value FROM json_each(?))",
+        (json.dumps(terms),)
+    )
+    postings = {term: dbt.decode_ids(blob) for term, blob in cur.fetchall()}
+    if item in postings:
+        return postings[item]
+    if len(postings) < len(terms) - 1 or not postings:
+        return None
+
+    ids = None
+    for posting in sorted(postings.values(), key=len):
+        ids = posting if ids is None else intersect_sorted(ids, posting)
+
+    return ids
+
+
+def search_by_ingredients(
+    cur:sqlite3.Cursor,
+    required:list[str],
+    optional:list[str]=None,
+    limit:int=None,
+):
+    """
+    Find recipes using every required ingredient, ranked by how many of
+    the optional ones they also use (all recipes using any optional one if
+    nothing is required).
+
+    Returns (results, n_matches, unknown): up to `limit` dicts with
+    recipe_id, recipe_name, the optional ingredients matched and missed
+    and a coverage score (the share of optional ingredients matched, 1.0
+    without any); the number of recipes matching; and the ingredients not
+    found in the index.
+    """
+    optional = optional or []
+    unknown = []
+
+    required_ids = []
+    for text in required:
+        ids = lookup_ingredient(cur, text)
+        if ids is None:
+            unknown.append(text)
+            ids = []
+        required_ids.append(ids)
+
+    optional_ids = []
+    for text in optional:
+        ids = lookup_ingredient(cur, text)
+        if ids is None:
+            unknown.append(text)
+            ids = []
+        optional_ids.append((text, ids))
+
+    # smallest posting first, so the candidate list only shrinks
+    if required_ids:
+        candidates = None
+        for ids in sorted(required_ids, key=len):
+            candidates = ids if candidates is None else intersect_sorted(candidates, ids)
+            if not candidates:
+                break
+
+    # optional ingredients matched per candidate, counted in C
+    n_matched = Counter()
+    for _, ids in optional_ids:
+        n_matched.update(intersect_sorted(candidates, ids) if required_ids else ids)
+    if not required_ids:
+        candidates = sorted(n_matched)
+
+    # best coverage first, then by id; only `limit` ids are ever sorted
+    n_wanted = limit if limit else len(candidates)
+    page = []
+    for count in range(len(optional_ids), 0, -1):
+        if len(page) >= n_wanted:
+            break
+        ids = [rid for rid, n in n_matched.items() if n == count]
+        page.extend(heapq.nsmallest(n_wanted - len(page), ids))
+    for rid in candidates:
+        if len(page) >= n_wanted:
+            break
+        if rid not in n_matched:
+            page.append(rid)
+
+    cur.execute(
+        "SELECT recipe_id, recipe_name FROM recipes WHERE recipe_id IN (SELECT value FROM json_each(?))",
+        (json.dumps(page),)
+    )
+    names = dict((row[0], row[1]) for row in cur.fetchall())
+
+    results = []
+    for rid in page:
+        texts = [text for text, ids in optional_ids if contains_sorted(ids, rid)]
+        results.append(dict(
+            recipe_id=rid,
+            recipe_name=names.get(rid),
+            matched=texts,
+            missing=[text for text in optional if text not in texts],
+            coverage=round(len(texts) / len(optional), 3) if optional else 1.0,
+        ))
+
+    return results, len(candidates), unknown
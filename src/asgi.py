@@ -0,0 +1,206 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import io
+import logging
+import os
+import sys
+import threading
+from urllib.parse import unquote
+
+
+logger = logging.getLogger(__name__)
+
+# sqlite and template work runs on this many threads per process
+DEFAULT_MAX_WORKERS = int(os.environ.get("RECIPE_SITE_ASGI_WORKERS", 8))
+
+
+class WsgiToAsgi:
+    """
+    Serve a WSGI app (the Flask app, with all of its routes) over ASGI.
+
+    The event loop only shuffles bytes; each request's WSGI call, including
+    its response iterator, runs on a bounded thread pool so SQLite queries
+    and template rendering never block the loop. At most `max_pending`
+    requests (by default one per thread) are handed to the pool at once,
+    the rest wait on the loop without queueing in the executor.
+    """
+
+    def __init__(self, wsgi_app, max_workers: int = DEFAULT_MAX_WORKERS, max_pending: int = None):
+        self.wsgi_app = wsgi_app
+        self.max_workers = max_workers
+        self.max_pending = max_pending or max_workers
+
+        self._executor = None
+        self._pending = None
+
+    def _start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="recipe-site"
+            )
+            self._pending = asyncio.Semaphore(self.max_pending)
+
+    def _stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            self._start()
+            async with self._pending:
+                await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"unsupported scope type {scope['type']!r}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self._stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _read_body(self, receive):
+        body = io.BytesIO()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            body.write(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body.seek(0)
+
+        return body
+
+    def build_environ(self, scope, body):
+        server_name, server_port = scope.get("server") or ("localhost", 80)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", ""),
+            "PATH_INFO": unquote(scope["path"], encoding="latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": str(server_name),
+            "SERVER_PORT": str(server_port),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        if scope.get("client"):
+            environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = map(str, scope["client"])
+
+        for name, value in scope.get("headers", []):
+            name = name.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                key = name
+            else:
+                key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+        return environ
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        environ = self.build_environ(scope, body)
+
+        # the whole WSGI call, including its response iterator, stays on one
+        # thread (Flask's request context lives there); messages come back
+        # through a small queue, so a slow client throttles the producer
+        messages = asyncio.Queue(maxsize=8)
+        aborted = threading.Event()
+
+        def put(message):
+            asyncio.run_coroutine_threadsafe(messages.put(message), loop).result()
+
+        def run():
+            started = dict()
+
+            def start_response(status, headers, exc_info=None):
+                started["status"] = int(status.split(" ", 1)[0])
+                started["headers"] = [
+                    (name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in headers
+                ]
+
+            try:
+                result = self.wsgi_app(environ, start_response)
+                try:
+                    for chunk in result:
+                        if aborted.is_set():
+                            break
+                        if not chunk:
+                            continue
+                        if started:
+                            put(("start", started.pop("status"), started.pop("headers")))
+                        put(("body", chunk))
+                finally:
+                    if hasattr(result, "close"):
+                        result.close()
+                if started:
+                    put(("start", started.pop("status"), started.pop("headers")))
+                put(("end",))
+            except Exception as e:
+                put(("error", e))
+
+        job = loop.run_in_executor(self._executor, run)
+        response_started = False
+        try:
+            while True:
+                message = await messages.get()
+                if message[0] == "start":
+                    response_started = True
+                    await send({
+                        "type": "http.response.start",
+                        "status": message[1],
+                        "headers": message[2],
+                    })
+                elif message[0] == "body":
+                    await send({"type": "http.response.body", "body": message[1], "more_body": True})
+                elif message[0] == "end":
+                    await send({"type": "http.response.body", "body": b""})
+                    break
+                else:
+                    if response_started:
+                        raise message[1]
+                    await send({
+                        "type": "http.response.start",
+                        "status": 500,
+                        "headers": [(b"content-type", b"text/plain")],
+                    })
+                    await send({"type": "http.response.body", "body": b"Internal Server Error"})
+                    logger.error("Error serving %s", scope["path"], exc_info=message[1])
+                    break
+        finally:
+            # let the worker thread finish (and return its connection)
+            # even if the client went away mid-response
+            aborted.set()
+            while not job.done():
+                drain = asyncio.ensure_future(messages.get())
+                await asyncio.wait({job, drain}, return_when=asyncio.FIRST_COMPLETED)
+                drain.cancel()
+            await job
+
+
+def make_application(max_workers: int = DEFAULT_MAX_WORKERS):
+    from app import app
+
+    return WsgiToAsgi(app.wsgi_app, max_workers=max_workers)
+
+
+application = make_application()
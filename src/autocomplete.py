@@ -0,0 +1,98 @@
+from bisect import bisect_left
+import re
+import threading
+import time
+
+
+WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str):
+    return WORD_RE.findall(text.lower())
+
+
+class RecipeNameIndex:
+    """
+    In-memory word-prefix index over recipe names for autocomplete.
+
+    The index is rebuilt lazily: at most once every `refresh_interval`
+    seconds it asks `version_fn` for the catalog version, and it only
+    reloads the names through `load_fn` when that version has changed.
+    Between checks, lookups never touch the database.
+    """
+
+    def __init__(self, version_fn, load_fn, refresh_interval: float = 5.0):
+        self.version_fn = version_fn
+        self.load_fn = load_fn
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = float("-inf")
+
+        # (recipe_ids, recipe_names, sorted words, entry index of each word)
+        self._snapshot = ([], [], [], [])
+
+    def _build(self, rows):
+        recipe_ids = []
+        recipe_names = []
+        word_entries = []
+        for i, (recipe_id, recipe_name) in enumerate(rows):
+            recipe_ids.append(recipe_id)
+            recipe_names.append(recipe_name)
+            word_entries.extend((word, i) for word in set(tokenize(recipe_name)))
+        word_entries.sort()
+
+        words = [w for w, _ in word_entries]
+        word_idx = [i for _, i in word_entries]
+
+        return (recipe_ids, recipe_names, words, word_idx)
+
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return
+
+        with self._lock:
+            # another thread may have refreshed while we waited
+            if not force and now - self._checked_at < self.refresh_interval:
+                return
+
+            version = self.version_fn()
+            if force or version != self._version:
+                self._snapshot = self._build(self.load_fn())
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def search(self, search_terms: list[str], limit: int = None):
+        """
+        Return (recipe_id, recipe_name) pairs whose names contain a word
+        starting with every search term, sorted by name.
+        """
+        self.refresh()
+        recipe_ids, recipe_names, words, word_idx = self._snapshot
+
+        terms = [t for term in search_terms for t in tokenize(term)]
+        if terms:
+            # collect the matching entries for each term, narrowest first
+            ranges = []
+            for term in terms:
+                lo = bisect_left(words, term)
+                hi = bisect_left(words, term + "\uffff", lo)
+                ranges.append((hi - lo, lo, hi))
+            ranges.sort()
+
+            _, lo, hi = ranges[0]
+            matches = set(word_idx[lo:hi])
+            for _, lo, hi in ranges[1:]:
+                if not matches:
+                    break
+                matches.intersection_update(word_idx[lo:hi])
+        else:
+            matches = range(len(recipe_ids))
+
+        matches = sorted(matches, key=lambda i: (recipe_names[i].lower(), recipe_ids[i]))
+        if limit:
+            matches = matches[:limit]
+
+        return [(recipe_ids[i], recipe_names[i]) for i in matches]
@@ -0,0 +1,197 @@
+import gzip
+import hashlib
+import os
+import stat
+import zlib
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# responses smaller than this are not worth the cpu or the extra headers
+MIN_COMPRESS_SIZE = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+    "text/css",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+}
+
+# precompressed sibling suffix for each encoding, in order of preference
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"} if brotli else {"gzip": ".gz"}
+
+
+def available_encodings():
+    return ["br", "gzip"] if brotli else ["gzip"]
+
+
+def choose_encoding(accept_encodings, encodings=None):
+    """
+    Pick the best encoding the client accepts (a werkzeug MIMEAccept-like
+    object from request.accept_encodings), or None for identity.
+    """
+    if encodings is None:
+        encodings = available_encodings()
+
+    best = None
+    best_quality = 0
+    for encoding in encodings:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+
+    return best
+
+
+def compress(data: bytes, encoding: str):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def iter_gzip(chunks):
+    """
+    Gzip a stream of str/bytes chunks, flushing after each one so the
+    client gets data as soon as it is produced.
+    """
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    finally:
+        # pass on a close() from the server, e.g. when the client hangs up
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def is_compressible(response):
+    return (
+        response.status_code == 200
+        and not response.direct_passthrough
+        and "Content-Encoding" not in response.headers
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+    )
+
+
+def compress_response(response, accept_encodings):
+    """
+    Compress a response in place if it is a compressible type and the
+    client accepts an encoding. Buffered responses must be at least
+    MIN_COMPRESS_SIZE bytes; streamed ones are gzipped chunk by chunk.
+    """
+    if not is_compressible(response):
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    if response.is_streamed:
+        if not choose_encoding(accept_encodings, ["gzip"]):
+            return response
+        response.response = iter_gzip(response.response)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        data = response.get_data()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return response
+
+        encoding = choose_encoding(accept_encodings)
+        if encoding is None:
+            return response
+
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+
+    # the compressed bytes are a different representation of the same
+    # resource, so downgrade a strong validator to a weak one
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+    return response
+
+
+def file_hash(fp):
+    hasher = hashlib.sha256()
+    with open(fp, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+
+class StaticHashes:
+    """
+    Content hashes of static files, recomputed only when a file's mtime or
+    size changes.
+    """
+
+    def __init__(self, static_folder, length: int = 12):
+        self.static_folder = static_folder
+        self.length = length
+        self._hashes = dict()
+
+    def get(self, path):
+        """
+        Return the short content hash of a regular file under static_folder,
+        or None if there is none at path (or path leads outside it).
+        """
+        # path comes from the request url; only hash what send_from_directory
+        # would serve
+        fp = safe_join(self.static_folder, path)
+        if fp is None:
+            return None
+        try:
+            st = os.stat(fp)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self._hashes.get(path)
+        if cached is None or cached[0] != key:
+            cached = self._hashes[path] = (key, file_hash(fp)[:self.length])
+
+        return cached[1]
+
+
+def find_precompressed(fp, accept_encodings):
+    """
+    Return (sibling path, encoding) for the best up-to-date precompressed
+    copy of fp the client accepts, or (None, None).
+    """
+    try:
+        mtime = os.stat(fp).st_mtime
+    except OSError:
+        return None, None
+
+    candidates = list(PRECOMPRESSED_SUFFIXES)
+    while candidates:
+        encoding = choose_encoding(accept_encodings, candidates)
+        if encoding is None:
+            break
+
+        sibling = fp + PRECOMPRESSED_SUFFIXES[encoding]
+        try:
+            if os.stat(sibling).st_mtime >= mtime:
+                return sibling, encoding
+        except OSError:
+            pass
+        candidates.remove(encoding)
+
+    return None, None
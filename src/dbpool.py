@@ -0,0 +1,243 @@
+from collections import deque
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# pragmas applied to every pooled connection
+COMMON_PRAGMAS = {
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -16 * 1024,  # KiB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+READ_PRAGMAS = {
+    "query_only": "ON",
+}
+
+WRITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+}
+
+
+class ConnectionPool:
+    """
+    Long-lived SQLite connections for one worker process.
+
+    Read connections are handed out from an idle list and returned on
+    checkin, so requests reuse a warm page cache and statement cache. All
+    writes go through a single write connection, held by one thread at a
+    time. The pool notices when it has been inherited across a fork and
+    starts over rather than sharing connections with the parent. The db
+    is switched to WAL when the pool is created, so readers never wait on
+    the writer, even before the first write.
+
+    Connections are opened on the file db_path resolves to. When db_path
+    is a symlink that gets swapped to a new generation of the db (see
+    rebuild.py), idle connections to the old file are closed, connections
+    in use are closed when checked in, and new ones open the new file.
+    """
+
+    def __init__(self, db_path, max_idle: int = 8, cached_statements: int = 256,
+                 factory=sqlite3.Connection):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.cached_statements = cached_statements
+        self.factory = factory
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._reset()
+        self._ensure_wal(self._path)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._path = os.path.realpath(self.db_path)
+        self._con_paths = dict()  # connection -> file it was opened on
+        self._idle = deque()
+        self._write_con = None
+        self._stats = dict(
+            generation_swaps=0,
+            opened=0,
+            closed=0,
+            checkouts=0,
+            reuses=0,
+            in_use=0,
+            write_checkouts=0,
+            write_wait_seconds=0.0,
+        )
+
+    def _ensure_wal(self, path):
+        # the journal mode is stored in the db file, so this is a no-op
+        # after the first time
+        if not os.path.exists(path):
+            return
+
+        con = sqlite3.connect(path, timeout=COMMON_PRAGMAS["busy_timeout"] / 1000)
+        try:
+            if con.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+                con.execute("PRAGMA journal_mode = WAL")
+        except sqlite3.Error as e:
+            # the write connection will set it on the first write
+            logger.warning("Could not switch %s to WAL: %s", path, e)
+        finally:
+            con.close()
+
+    def _check_pid(self):
+        # connections must not cross a fork (e.g. uwsgi's master -> worker)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def _check_generation(self):
+        path = os.path.realpath(self.db_path)
+        if path == self._path:
+            return
+
+        with self._lock:
+            if path == self._path:
+                return
+            self._path = path
+            self._stats["generation_swaps"] += 1
+            stale = list(self._idle)
+            self._idle.clear()
+
+        for con in stale:
+            self._close(con)
+        self._ensure_wal(path)
+
+    def is_current(self, con):
+        """
+        Whether con was opened on the file db_path resolves to right now.
+        """
+        self._check_generation()
+
+        with self._lock:
+            return self._con_paths.get(con) == self._path
+
+    def _close(self, con):
+        with self._lock:
+            self._con_paths.pop(con, None)
+            self._stats["closed"] += 1
+        con.close()
+
+    def _connect(self, pragmas):
+        path = self._path
+        con = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=self.factory,
+        )
+        cur = con.cursor()
+        for pragma, value in {**COMMON_PRAGMAS, **pragmas}.items():
+            cur.execute(f"PRAGMA {pragma} = {value}")
+        cur.close()
+
+        with self._lock:
+            self._con_paths[con] = path
+            self._stats["opened"] += 1
+
+        return con
+
+    def checkout(self):
+        """
+        Return a read-only connection; give it back with checkin().
+        """
+        self._check_pid()
+        self._check_generation()
+
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            if self._idle:
+                self._stats["reuses"] += 1
+                return self._idle.pop()
+
+        try:
+            return self._connect(READ_PRAGMAS)
+        except:
+            with self._lock:
+                self._stats["in_use"] -= 1
+            raise
+
+    def checkin(self, con):
+        # end any read transaction so the connection sees new data next time
+        if con.in_transaction:
+            con.rollback()
+        con.row_factory = None
+
+        with self._lock:
+            self._stats["in_use"] -= 1
+            if (self._pid == os.getpid() and len(self._idle) < self.max_idle
+                    and self._con_paths.get(con) == self._path):
+                self._idle.append(con)
+                return
+
+        self._close(con)
+
+    def checkout_write(self):
+        """
+        Return the write connection, blocking while another thread holds it;
+        give it back with checkin_write().
+        """
+        self._check_pid()
+        self._check_generation()
+
+        start = time.perf_counter()
+        self._write_lock.acquire()
+        self._stats["write_wait_seconds"] += time.perf_counter() - start
+        self._stats["write_checkouts"] += 1
+
+        try:
+            if self._write_con is not None and not self.is_current(self._write_con):
+                self._close(self._write_con)
+                self._write_con = None
+            if self._write_con is None:
+                self._write_con = self._connect(WRITE_PRAGMAS)
+        except:
+            self._write_lock.release()
+            raise
+
+        return self._write_con
+
+    def checkin_write(self, con):
+        try:
+            if con.in_transaction:
+                con.rollback()
+            con.row_factory = None
+        finally:
+            self._write_lock.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, idle=len(self._idle), pid=self._pid)
+
+        return stats
+
+    def health(self):
+        """
+        Run a trivial query on a pooled connection and report pool stats.
+        """
+        stats = self.stats()
+        con = self.checkout()
+        try:
+            start = time.perf_counter()
+            con.execute("SELECT 1").fetchone()
+            stats["ping_seconds"] = time.perf_counter() - start
+            stats["journal_mode"] = con.execute("PRAGMA journal_mode").fetchone()[0]
+            stats["ok"] = True
+        except sqlite3.Error as e:
+            stats["ok"] = False
+            stats["error"] = str(e)
+        finally:
+            self.checkin(con)
+
+        return stats
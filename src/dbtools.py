@@ -1,4 +1,13 @@
+from array import array
+from datetime import datetime, timedelta
+import json
+import logging
 import sqlite3
+import sys
+from ingredients import ingredient_terms, parse_ingredient
+
+
+logger = logging.getLogger(__name__)
 
 
 def create_recipe_table(con):
@@ -56,6 +65,615 @@ def create_recipe_schedule_table(con):
     con.commit()
 
 
+def create_catalog_meta_table(con):
+    cur = con.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS catalog_meta (
+       meta_key TEXT PRIMARY KEY,
+       meta_value INTEGER DEFAULT 0 NOT NULL
+    );
+    """)
+    con.commit()
+
+
+def get_meta_value(cur, meta_key):
+    cur.execute(
+        "SELECT meta_value FROM catalog_meta WHERE meta_key = ?",
+        (meta_key,)
+    )
+    row = cur.fetchone()
+
+    return row[0] if row else 0
+
+
+def get_meta_values(cur, meta_keys):
+    """
+    Return {meta_key: (meta_value, updated_at)} for the given keys, with
+    (0, None) for keys that were never bumped.
+    """
+    meta_values = {meta_key: (0, None) for meta_key in meta_keys}
+    cur.execute(
+        "SELECT meta_key, meta_value, updated_at FROM catalog_meta WHERE meta_key IN (SELECT value FROM json_each(?))",
+        (json.dumps(list(meta_keys)),)
+    )
+    for meta_key, meta_value, updated_at in cur.fetchall():
+        meta_values[meta_key] = (meta_value, updated_at)
+
+    return meta_values
+
+
+def bump_meta_value(cur, meta_key):
+    """
+    Increment a version counter in catalog_meta and stamp its update time
+    (unix seconds). The caller commits.
+    """
+    cur.execute("""
+        INSERT INTO catalog_meta (meta_key, meta_value, updated_at)
+        VALUES (?, 1, CAST(strftime('%s', 'now') AS INTEGER))
+        ON CONFLICT (meta_key) DO UPDATE SET
+           meta_value = meta_value + 1
+          ,updated_at = excluded.updated_at
+        """,
+        (meta_key,)
+    )
+
+
+def get_catalog_version(cur):
+    return get_meta_value(cur, "catalog_version")
+
+
+def bump_catalog_version(con):
+    cur = con.cursor()
+    bump_meta_value(cur, "catalog_version")
+    con.commit()
+
+
+def create_recipe_search_table(con):
+    cur = con.cursor()
+    cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipe_search'"
+    )
+    table_exists = cur.fetchone() is not None
+
+    # full-text index over each recipe, keyed by rowid = recipe_id
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search USING fts5(
+       recipe_name,
+       ingredients,
+       directions,
+       tokenize = 'unicode61 remove_diacritics 2',
+       prefix = '2 3'
+    );
+    """)
+    con.commit()
+
+    # back-fill when adding the index to an existing db
+    if not table_exists:
+        refresh_recipe_search(con)
+
+
+def refresh_recipe_search(con, recipe_ids=None):
+    """
+    Rebuild the recipe_search rows for the given recipe_ids (all recipes if
+    recipe_ids is None) from the recipes, ingredients and directions tables.
+    """
+    cur = con.cursor()
+    _refresh_recipe_search(cur, recipe_ids)
+    con.commit()
+
+
+def _refresh_recipe_search(cur, recipe_ids=None):
+    if recipe_ids is None:
+        id_filter = ""
+        params = ()
+        cur.execute("DELETE FROM recipe_search")
+    else:
+        # pass the ids as one json array to avoid sqlite's variable limit
+        id_filter = "WHERE recipe_id IN (SELECT value FROM json_each(?))"
+        params = (json.dumps([int(rid) for rid in recipe_ids]),)
+        cur.execute(
+            "DELETE FROM recipe_search WHERE rowid IN (SELECT value FROM json_each(?))",
+            params
+        )
+
+    # aggregate each table once rather than once per recipe
+    cur.execute(f"""
+        INSERT INTO recipe_search (rowid, recipe_name, ingredients, directions)
+        SELECT
+           r.recipe_id
+          ,r.recipe_name
+          ,i.ingredients
+          ,d.directions
+        FROM (SELECT recipe_id, recipe_name FROM recipes {id_filter}) AS r
+        LEFT JOIN (
+          SELECT recipe_id, group_concat(ingredient, ' ') AS ingredients
+          FROM ingredients {id_filter} GROUP BY recipe_id
+        ) AS i
+          ON i.recipe_id = r.recipe_id
+        LEFT JOIN (
+          SELECT recipe_id, group_concat(direction, ' ') AS directions
+          FROM directions {id_filter} GROUP BY recipe_id
+        ) AS d
+          ON d.recipe_id = r.recipe_id
+        """,
+        params * 3
+    )
+
+
+def recipe_search_record(recipe_id, recipe_dict):
+    """
+    Return the recipe_search row of one extracted recipe.
+    """
+    return (
+        recipe_id,
+        recipe_dict['title'],
+        " ".join(ingredient for _, ingredient in recipe_dict.get('ingredients', [])),
+        " ".join(recipe_dict.get('directions', [])),
+    )
+
+
+def create_ingest_manifest_table(con):
+    cur = con.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ingest_manifest (
+       source_file TEXT PRIMARY KEY,
+       file_size INTEGER NOT NULL,
+       file_mtime REAL NOT NULL,
+       content_hash TEXT NOT NULL,
+       ingested_datetime TEXT NOT NULL
+    );
+    """)
+    con.commit()
+
+
+def get_ingest_manifest(con):
+    """
+    Return {source_file: (file_size, file_mtime, content_hash)}.
+    """
+    cur = con.cursor()
+    cur.execute(
+        "SELECT source_file, file_size, file_mtime, content_hash FROM ingest_manifest"
+    )
+
+    return {row[0]: (row[1], row[2], row[3]) for row in cur.fetchall()}
+
+
+def dedupe_recipes(cur):
+    """
+    Collapse recipes sharing a (recipe_name, source_file) pair onto the
+    oldest recipe_id, repointing any schedule rows at it.
+    """
+    cur.execute("""
+        CREATE TEMP TABLE recipe_dupes AS
+        SELECT
+           r.recipe_id
+          ,k.keep_id
+        FROM recipes AS r
+        INNER JOIN (
+          SELECT recipe_name, source_file, min(recipe_id) AS keep_id
+          FROM recipes
+          GROUP BY recipe_name, source_file
+          HAVING count(*) > 1
+        ) AS k
+          ON r.recipe_name = k.recipe_name
+         AND r.source_file = k.source_file
+        WHERE r.recipe_id != k.keep_id
+    """)
+    cur.execute("""
+        UPDATE recipe_schedule
+        SET recipe_id = (SELECT keep_id FROM recipe_dupes WHERE recipe_dupes.recipe_id = recipe_schedule.recipe_id)
+        WHERE recipe_id IN (SELECT recipe_id FROM recipe_dupes)
+    """)
+    cur.execute("SELECT recipe_id FROM recipe_dupes")
+    delete_recipes(cur, [row[0] for row in cur.fetchall()])
+    cur.execute("DROP TABLE recipe_dupes")
+
+
+def add_lookup_indexes(cur):
+    dedupe_recipes(cur)
+    for index_sql in [
+            "CREATE UNIQUE INDEX IF NOT EXISTS recipes_name_source_idx ON recipes (recipe_name, source_file)",
+            "CREATE INDEX IF NOT EXISTS recipes_source_idx ON recipes (source_file)",
+            "CREATE INDEX IF NOT EXISTS ingredients_recipe_idx ON ingredients (recipe_id, ingredient_number)",
+            "CREATE INDEX IF NOT EXISTS directions_recipe_idx ON directions (recipe_id, direction_number)",
+            "CREATE INDEX IF NOT EXISTS recipe_schedule_week_idx ON recipe_schedule (week_start)",
+            "CREATE INDEX IF NOT EXISTS recipe_schedule_day_idx ON recipe_schedule (scheduled_day)",
+            "CREATE INDEX IF NOT EXISTS recipe_schedule_recipe_idx ON recipe_schedule (recipe_id, scheduled_day)"]:
+        cur.execute(index_sql)
+
+
+def refresh_recipe_stats(cur, recipe_ids=None):
+    """
+    Recompute the recipe_stats rollup for the given recipe_ids (all
+    scheduled recipes if None) from recipe_schedule. The caller commits.
+    """
+    if recipe_ids is None:
+        id_filter = ""
+        params = ()
+        cur.execute("DELETE FROM recipe_stats")
+    else:
+        id_filter = "WHERE rs.recipe_id IN (SELECT value FROM json_each(?))"
+        params = (json.dumps([int(rid) for rid in recipe_ids]),)
+        cur.execute(
+            "DELETE FROM recipe_stats WHERE recipe_id IN (SELECT value FROM json_each(?))",
+            params
+        )
+
+    cur.execute(f"""
+        INSERT INTO recipe_stats (recipe_id, recipe_name, times_cooked, last_cooked)
+        SELECT
+           rs.recipe_id
+          ,COALESCE(max(r.recipe_name), '')
+          ,SUM(COALESCE(rs.quantity, 1))
+          ,MAX(rs.scheduled_day)
+        FROM recipe_schedule AS rs
+        LEFT JOIN recipes AS r
+          ON rs.recipe_id = r.recipe_id
+        {id_filter}
+        GROUP BY rs.recipe_id
+        """,
+        params
+    )
+
+
+def add_recipe_stats(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recipe_stats (
+       recipe_id INTEGER PRIMARY KEY,
+       recipe_name TEXT DEFAULT '' NOT NULL,
+       times_cooked INTEGER NOT NULL,
+       last_cooked TEXT NOT NULL
+    );
+    """)
+
+    # one index per top-recipes sort key, for keyset pagination
+    for index_sql in [
+            "CREATE INDEX IF NOT EXISTS recipe_stats_name_idx ON recipe_stats (recipe_name, times_cooked, recipe_id)",
+            "CREATE INDEX IF NOT EXISTS recipe_stats_times_idx ON recipe_stats (times_cooked, last_cooked, recipe_id)",
+            "CREATE INDEX IF NOT EXISTS recipe_stats_last_idx ON recipe_stats (last_cooked, times_cooked, recipe_id)"]:
+        cur.execute(index_sql)
+
+    refresh_recipe_stats(cur)
+
+
+def add_meta_timestamps(cur):
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(catalog_meta)").fetchall()]
+    if "updated_at" not in columns:
+        cur.execute("ALTER TABLE catalog_meta ADD COLUMN updated_at INTEGER")
+
+
+def add_parsed_ingredients(cur):
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(ingredients)").fetchall()]
+    for column, column_type in [("quantity", "REAL"), ("unit", "TEXT"), ("item", "TEXT")]:
+        if column not in columns:
+            cur.execute(f"ALTER TABLE ingredients ADD COLUMN {column} {column_type}")
+
+    # parse the ingredients loaded before this migration
+    cur.execute("SELECT rowid, ingredient FROM ingredients")
+    records = [parse_ingredient(ingredient) + (rowid,) for rowid, ingredient in cur.fetchall()]
+    cur.executemany(
+        "UPDATE ingredients SET quantity = ?, unit = ?, item = ? WHERE rowid = ?",
+        records
+    )
+
+
+def add_schedule_unique_key(cur):
+    # fold duplicate (week, day, recipe) rows into the earliest one
+    cur.execute("""
+    UPDATE recipe_schedule
+    SET quantity = (
+      SELECT SUM(dup.quantity)
+      FROM recipe_schedule AS dup
+      WHERE dup.week_start = recipe_schedule.week_start
+        AND dup.day_of_week = recipe_schedule.day_of_week
+        AND dup.recipe_id = recipe_schedule.recipe_id
+    )
+    WHERE rowid IN (
+      SELECT MIN(rowid)
+      FROM recipe_schedule
+      GROUP BY week_start, day_of_week, recipe_id
+      HAVING COUNT(*) > 1
+    )
+    """)
+    cur.execute("""
+    DELETE FROM recipe_schedule
+    WHERE rowid NOT IN (
+      SELECT MIN(rowid)
+      FROM recipe_schedule
+      GROUP BY week_start, day_of_week, recipe_id
+    )
+    """)
+
+    # the unique key leads with week_start, so it replaces the week index
+    cur.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS recipe_schedule_week_day_recipe_idx
+    ON recipe_schedule (week_start, day_of_week, recipe_id)
+    """)
+    cur.execute("DROP INDEX IF EXISTS recipe_schedule_week_idx")
+
+
+def add_recipe_name_index(cur):
+    # case-insensitive prefix ranges and keyset pages for the recipe picker
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS recipes_name_nocase_idx
+    ON recipes (recipe_name COLLATE NOCASE, recipe_id)
+    """)
+
+
+def encode_ids(recipe_ids):
+    """
+    Pack sorted recipe ids as little-endian uint32s, the format of
+    ingredient_terms.recipe_ids.
+    """
+    ids = array("I", recipe_ids)
+    if sys.byteorder == "big":
+        ids.byteswap()
+
+    return ids.tobytes()
+
+
+def decode_ids(blob):
+    ids = array("I")
+    ids.frombytes(blob)
+    if sys.byteorder == "big":
+        ids.byteswap()
+
+    return ids
+
+
+def select_ingredient_items(cur, recipe_ids=None):
+    """
+    Return the (recipe_id, item) pairs of the given recipes (all recipes if
+    None).
+    """
+    if recipe_ids is None:
+        cur.execute("SELECT recipe_id, item FROM ingredients WHERE item IS NOT NULL")
+    else:
+        cur.execute(
+            "SELECT recipe_id, item FROM ingredients WHERE item IS NOT NULL AND recipe_id IN (SELECT value FROM json_each(?))",
+            (json.dumps([int(rid) for rid in recipe_ids]),)
+        )
+
+    return cur.fetchall()
+
+
+def _term_postings(items):
+    """
+    Return {term: sorted recipe ids} from (recipe_id, item) pairs.
+    """
+    # items repeat across recipes far more often than not
+    terms_by_item = dict()
+    postings = dict()
+    for recipe_id, item in items:
+        if not item:
+            continue
+        terms = terms_by_item.get(item)
+        if terms is None:
+            terms = terms_by_item[item] = ingredient_terms(item)
+        for term in terms:
+            postings.setdefault(term, set()).add(recipe_id)
+
+    return {term: sorted(ids) for term, ids in postings.items()}
+
+
+def refresh_ingredient_terms(cur, recipe_ids=None, items=None, new: bool = False):
+    """
+    Bring the ingredient_terms inverted index in line with the ingredients
+    of the given recipe_ids (rebuilding it from scratch if None), after
+    they were inserted, re-parsed or deleted. `items` may pass in their
+    (recipe_id, item) pairs if the caller has them at hand. new=True says
+    the recipe_ids were just inserted, so only the postings of their terms
+    are touched. The caller commits.
+    """
+    if recipe_ids is None:
+        postings = _term_postings(select_ingredient_items(cur))
+        cur.execute("DELETE FROM ingredient_terms")
+        cur.executemany(
+            "INSERT INTO ingredient_terms (term, n_recipes, recipe_ids) VALUES (?, ?, ?)",
+            [(term, len(ids), encode_ids(ids)) for term, ids in postings.items()]
+        )
+        return
+
+    recipe_ids = {int(rid) for rid in recipe_ids}
+    if not recipe_ids:
+        return
+    if items is None:
+        items = select_ingredient_items(cur, recipe_ids)
+    new_postings = _term_postings(items)
+
+    if new:
+        # recipe ids are never reused (AUTOINCREMENT), so no posting holds
+        # them yet
+        cur.execute(
+            "SELECT term, recipe_ids FROM ingredient_terms WHERE term IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(new_postings)),)
+        )
+    else:
+        # a recipe's old terms are unknown once its ingredients are
+        # replaced, so every posting is checked; decoding is a memcpy per term
+        cur.execute("SELECT term, recipe_ids FROM ingredient_terms")
+
+    updates = []
+    deletes = []
+    for term, blob in cur.fetchall():
+        ids = decode_ids(blob)
+        added = new_postings.pop(term, [])
+        if new or recipe_ids.isdisjoint(ids):
+            if not added:
+                continue
+            merged = sorted(ids.tolist() + added)
+        else:
+            merged = sorted([rid for rid in ids if rid not in recipe_ids] + added)
+
+        if merged:
+            updates.append((term, len(merged), encode_ids(merged)))
+        else:
+            deletes.append((term,))
+
+    updates.extend((term, len(ids), encode_ids(ids)) for term, ids in new_postings.items())
+    cur.executemany("DELETE FROM ingredient_terms WHERE term = ?", deletes)
+    cur.executemany(
+        "INSERT OR REPLACE INTO ingredient_terms (term, n_recipes, recipe_ids) VALUES (?, ?, ?)",
+        updates
+    )
+
+
+def add_ingredient_terms(cur):
+    # term -> sorted recipe ids, for "cook with what I have" searches
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ingredient_terms (
+       term TEXT PRIMARY KEY,
+       n_recipes INTEGER NOT NULL,
+       recipe_ids BLOB NOT NULL
+    ) WITHOUT ROWID;
+    """)
+
+    refresh_ingredient_terms(cur)
+
+
+def add_recipe_neighbors(cur):
+    # precomputed "similar recipes", filled in by similar.py after ingest
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recipe_neighbors (
+       recipe_id INTEGER NOT NULL,
+       rank INTEGER NOT NULL,
+       neighbor_id INTEGER NOT NULL,
+       score REAL NOT NULL,
+       PRIMARY KEY (recipe_id, rank)
+    ) WITHOUT ROWID;
+    """)
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS recipe_neighbors_neighbor_idx
+    ON recipe_neighbors (neighbor_id)
+    """)
+
+    # the content each recipe's neighbors were last computed from
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recipe_neighbor_state (
+       recipe_id INTEGER PRIMARY KEY,
+       content_hash TEXT NOT NULL
+    );
+    """)
+
+
+def get_schedule_week(cur, week_start):
+    """
+    Return {(day_of_week, recipe_id): quantity} for the stored week.
+    """
+    cur.execute(
+        """
+        SELECT day_of_week, recipe_id, quantity
+        FROM recipe_schedule
+        WHERE week_start = ?
+        """,
+        (week_start,)
+    )
+
+    return {(day, recipe_id): quantity for day, recipe_id, quantity in cur.fetchall()}
+
+
+def sync_schedule_week(cur, week_start, entries, add_time):
+    """
+    Make the stored week match `entries`, {(day_of_week, recipe_id):
+    quantity}, touching only the rows that differ. Returns the ids of the
+    recipes whose rows changed. The caller runs this in a write
+    transaction and commits.
+    """
+    stored = get_schedule_week(cur, week_start)
+    week_date = datetime.strptime(week_start, "%Y-%m-%d")
+
+    removed = [key for key in stored if key not in entries]
+    upserts = [
+        (
+            week_start,
+            (week_date + timedelta(days=day)).strftime("%Y-%m-%d"),
+            day,
+            recipe_id,
+            quantity,
+            add_time,
+        )
+        for (day, recipe_id), quantity in entries.items()
+        if stored.get((day, recipe_id)) != quantity
+    ]
+
+    if removed:
+        cur.executemany(
+            """
+            DELETE FROM recipe_schedule
+            WHERE week_start = ? AND day_of_week = ? AND recipe_id = ?
+            """,
+            [(week_start, day, recipe_id) for day, recipe_id in removed]
+        )
+    if upserts:
+        cur.executemany(
+            """
+            INSERT INTO recipe_schedule (
+                 week_start
+               , scheduled_day
+               , day_of_week
+               , recipe_id
+               , quantity
+               , added_datetime
+            )
+            VALUES (?,?,?,?,?,?)
+            ON CONFLICT (week_start, day_of_week, recipe_id) DO UPDATE SET
+                 quantity = excluded.quantity
+               , added_datetime = excluded.added_datetime
+            """,
+            upserts
+        )
+
+    return {recipe_id for _, recipe_id in removed} | {record[3] for record in upserts}
+
+
+# schema migrations, applied in order; a db's PRAGMA user_version is the
+# number of migrations it has seen. Each must be safe to re-run, since
+# create_db_destructive starts over from version 0.
+MIGRATIONS = [
+    add_lookup_indexes,
+    add_recipe_stats,
+    add_meta_timestamps,
+    add_parsed_ingredients,
+    add_schedule_unique_key,
+    add_recipe_name_index,
+    add_ingredient_terms,
+    add_recipe_neighbors,
+]
+
+
+def migrate_db(con):
+    """
+    Apply any migrations newer than the db's user_version, each in its own
+    transaction, then ANALYZE so the planner picks up new indexes.
+    """
+    cur = con.cursor()
+    version = cur.execute("PRAGMA user_version").fetchone()[0]
+    if version >= len(MIGRATIONS):
+        return version
+
+    for i, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            # app workers starting together race to migrate; whoever gets
+            # the write lock second finds the migration already applied
+            cur.execute("BEGIN IMMEDIATE")
+            if cur.execute("PRAGMA user_version").fetchone()[0] >= i:
+                cur.execute("COMMIT")
+                continue
+            migration(cur)
+            cur.execute(f"PRAGMA user_version = {i}")
+            cur.execute("COMMIT")
+        except:
+            if con.in_transaction:
+                cur.execute("ROLLBACK")
+            raise
+        logger.info("Applied migration %d: %s", i, migration.__name__)
+
+    cur.execute("ANALYZE")
+    con.commit()
+
+    return len(MIGRATIONS)
+
+
 def create_db(con):
     cur = con.cursor()
 
@@ -63,9 +681,15 @@ def create_db(con):
     create_ingredient_table(con)
     create_direction_table(con)
     create_recipe_schedule_table(con)
+    create_recipe_search_table(con)
+    create_catalog_meta_table(con)
+    create_ingest_manifest_table(con)
 
     con.commit()
 
+    # bring older dbs up to date
+    migrate_db(con)
+
 
 def create_db_destructive(con):
     cur = con.cursor()
@@ -73,83 +697,346 @@ def create_db_destructive(con):
     cur.execute("DROP TABLE IF EXISTS recipes")
     cur.execute("DROP TABLE IF EXISTS ingredients")
     cur.execute("DROP TABLE IF EXISTS directions")
+    cur.execute("DROP TABLE IF EXISTS recipe_search")
+    cur.execute("DROP TABLE IF EXISTS ingest_manifest")
+    cur.execute("DROP TABLE IF EXISTS ingredient_terms")
+    cur.execute("DROP TABLE IF EXISTS recipe_neighbors")
+    cur.execute("DROP TABLE IF EXISTS recipe_neighbor_state")
+
+    # the dropped tables lost their indexes; re-run every migration
+    cur.execute("PRAGMA user_version = 0")
     create_db(con)
+    bump_catalog_version(con)
 
     con.commit()
 
 
-def update_db(con, extracted_recipes):
-    cur = con.cursor()
+INSERT_INGREDIENT_SQL = "INSERT INTO ingredients (recipe_id, recipe_step, ingredient_number, ingredient, quantity, unit, item) VALUES (?,?,?,?,?,?,?)"
+INSERT_DIRECTION_SQL = "INSERT INTO directions (recipe_id, direction_number, direction) VALUES (?,?,?)"
+INSERT_SEARCH_SQL = "INSERT INTO recipe_search (rowid, recipe_name, ingredients, directions) VALUES (?,?,?,?)"
 
-    # get number of existing recipes
-    cur.execute("select max(recipe_id) from recipes")
-    max_recipe_id = cur.fetchone()[0]
-    if max_recipe_id is None:
-        max_recipe_id = 0
 
-    # list to hold existing recipes
-    cur.execute("select recipe_name, source_file from recipes")
-    existing_recipes = set(cur.fetchall())
+def recipe_step_records(recipe_id, recipe_dict):
+    """
+    Return the ingredient and direction rows of one extracted recipe.
+    """
+    ingredient_list = recipe_dict.get('ingredients', [])
+    ingredient_records = [
+        (recipe_id, recipe_step, i, ingredient) + parse_ingredient(ingredient)
+        for i, (recipe_step, ingredient) in enumerate(ingredient_list)
+    ]
 
+    direction_list = recipe_dict.get('directions', [])
+    direction_records = [(recipe_id, i, direction) for i, direction in enumerate(direction_list)]
 
-    # list to hold new recipes
-    new_recipes = [
-        recipe_dict for recipe_dict in extracted_recipes if
-        (recipe_dict['title'], recipe_dict['source_file'])
-        not in existing_recipes
-    ]
+    return ingredient_records, direction_records
+
+
+def insert_recipe_steps(cur, recipe_id, recipe_dict):
+    """
+    Insert the ingredient and direction rows of one extracted recipe.
+    """
+    ingredient_records, direction_records = recipe_step_records(recipe_id, recipe_dict)
+    cur.executemany(INSERT_INGREDIENT_SQL, ingredient_records)
+    cur.executemany(INSERT_DIRECTION_SQL, direction_records)
+
+
+def delete_recipes(cur, recipe_ids):
+    ids_json = json.dumps([int(rid) for rid in recipe_ids])
+    for table, id_col in [
+            ("ingredients", "recipe_id"),
+            ("directions", "recipe_id"),
+            ("recipe_search", "rowid"),
+            ("recipes", "recipe_id")]:
+        cur.execute(
+            f"DELETE FROM {table} WHERE {id_col} IN (SELECT value FROM json_each(?))",
+            (ids_json,)
+        )
+
+    # similar recipes (see similar.py), if migrated: drop the lists of and
+    # entries for the deleted recipes, and forget the content hashes of the
+    # recipes that listed them so their lists are recomputed
+    cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipe_neighbors'"
+    )
+    if cur.fetchone() is not None:
+        cur.execute("""
+        DELETE FROM recipe_neighbor_state
+        WHERE recipe_id IN (SELECT value FROM json_each(:ids))
+           OR recipe_id IN (
+             SELECT recipe_id
+             FROM recipe_neighbors
+             WHERE neighbor_id IN (SELECT value FROM json_each(:ids))
+           )
+        """, dict(ids=ids_json))
+        cur.execute("""
+        DELETE FROM recipe_neighbors
+        WHERE recipe_id IN (SELECT value FROM json_each(:ids))
+           OR neighbor_id IN (SELECT value FROM json_each(:ids))
+        """, dict(ids=ids_json))
+
+
+def sync_source_files(con, changed_files, removed_files=(), batch_size=None):
+    """
+    Bring the catalog in line with re-extracted source files.
+
+    changed_files is an iterable of (source_file, extracted_recipes,
+    file_size, file_mtime, content_hash). Recipes are matched on
+    (recipe_name, source_file) so existing recipe_ids (and the schedule
+    history pointing at them) survive edits; recipes that disappeared from a
+    file are deleted, as are all recipes of removed_files.
+
+    Everything is written in one transaction unless batch_size is given, in
+    which case a transaction is committed every batch_size files so
+    changed_files can be streamed without holding the whole catalog.
+    """
+    cur = con.cursor()
+    touched_ids = []
+    deleted_ids = []
+
+    # ids written in the current transaction
+    batch_touched = []
+    batch_deleted = []
+    n_batch_files = 0
 
-    for recipe_dict in new_recipes:
-        # message
-        print(f"Inserting {recipe_dict['title']}")
+    def flush():
+        if batch_deleted:
+            delete_recipes(cur, batch_deleted)
+        if batch_touched:
+            _refresh_recipe_search(cur, batch_touched)
+        if batch_touched or batch_deleted:
+            refresh_ingredient_terms(cur, batch_touched + batch_deleted)
+            bump_meta_value(cur, "catalog_version")
+        cur.execute("COMMIT")
 
-        # add some missing keys
-        for k in ['prep-time', 'cook-time', 'servings', 'source-url']:
-            if not k in recipe_dict:
-                recipe_dict[k] = None
+        touched_ids.extend(batch_touched)
+        deleted_ids.extend(batch_deleted)
+        batch_touched.clear()
+        batch_deleted.clear()
 
-        # only create
-        if 'title' in recipe_dict.keys():
+    try:
+        cur.execute("BEGIN")
+
+        for source_file in removed_files:
             cur.execute(
-                "INSERT INTO recipes (recipe_name, prep_time, cook_time, servings, source_url, source_file) VALUES (?,?,?,?,?,?)",
-                (recipe_dict['title'], recipe_dict['prep-time'], recipe_dict['cook-time'],
-                 recipe_dict['servings'], recipe_dict['source-url'], recipe_dict['source_file'])
+                "SELECT recipe_id FROM recipes WHERE source_file = ?",
+                (source_file,)
             )
-
-            # get the assigned id - take max just in case
+            batch_deleted.extend(row[0] for row in cur.fetchall())
             cur.execute(
-                "select max(recipe_id) from recipes where recipe_name = ? and source_file = ?",
-                (recipe_dict['title'], recipe_dict['source_file'])
+                "DELETE FROM ingest_manifest WHERE source_file = ?",
+                (source_file,)
             )
-            recipe_id = cur.fetchone()[0]
 
-        else:
-            print(recipe_dict)
-            break
+        for source_file, extracted_recipes, file_size, file_mtime, content_hash in changed_files:
+            touched, deleted = _sync_source_file(
+                cur, source_file, extracted_recipes, file_size, file_mtime, content_hash
+            )
+            batch_touched.extend(touched)
+            batch_deleted.extend(deleted)
 
-        if 'ingredients' in recipe_dict.keys():
-            ingredient_list = recipe_dict['ingredients']
-            n_ingredients = len(ingredient_list)
-            records = [(recipe_id, recipe_step, i, ingredient) for i, (recipe_step, ingredient) in enumerate(ingredient_list)]
+            n_batch_files += 1
+            if batch_size and n_batch_files >= batch_size:
+                flush()
+                n_batch_files = 0
+                cur.execute("BEGIN")
 
-            cur.executemany(
-                "INSERT INTO ingredients (recipe_id, recipe_step, ingredient_number, ingredient) VALUES (?,?,?,?)",
-                records
-            )
+        flush()
+    except:
+        if con.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+
+    return touched_ids, deleted_ids
 
-        if 'directions' in recipe_dict.keys():
-            direction_list = recipe_dict['directions']
-            n_directions = len(direction_list)
-            records = [(recipe_id, i, direction) for i, direction in enumerate(direction_list)]
 
-            cur.executemany(
-                "INSERT INTO directions (recipe_id, direction_number, direction) VALUES (?,?,?)",
-                records
+def _sync_source_file(cur, source_file, extracted_recipes, file_size, file_mtime, content_hash):
+    add_time = str(datetime.now())[0:23]
+    touched_ids = []
+
+    # existing ids by name, oldest first, to pair with the file's recipes
+    cur.execute(
+        "SELECT recipe_name, recipe_id FROM recipes WHERE source_file = ? ORDER BY recipe_id",
+        (source_file,)
+    )
+    existing_ids = dict()
+    for recipe_name, recipe_id in cur.fetchall():
+        existing_ids.setdefault(recipe_name, []).append(recipe_id)
+
+    seen_titles = set()
+    for recipe_dict in extracted_recipes:
+        # (recipe_name, source_file) is unique, so later duplicates are dropped
+        if 'title' not in recipe_dict or recipe_dict['title'] in seen_titles:
+            continue
+        seen_titles.add(recipe_dict['title'])
+
+        values = (
+            recipe_dict.get('prep-time'), recipe_dict.get('cook-time'),
+            recipe_dict.get('servings'), recipe_dict.get('source-url'),
+        )
+        matching_ids = existing_ids.get(recipe_dict['title'])
+
+        if matching_ids:
+            recipe_id = matching_ids.pop(0)
+            cur.execute(
+                "UPDATE recipes SET prep_time = ?, cook_time = ?, servings = ?, source_url = ? WHERE recipe_id = ?",
+                values + (recipe_id,)
             )
+            cur.execute("DELETE FROM ingredients WHERE recipe_id = ?", (recipe_id,))
+            cur.execute("DELETE FROM directions WHERE recipe_id = ?", (recipe_id,))
+        else:
+            cur.execute(
+                "INSERT INTO recipes (recipe_name, prep_time, cook_time, servings, source_url, source_file) VALUES (?,?,?,?,?,?)",
+                (recipe_dict['title'],) + values + (source_file,)
+            )
+            recipe_id = cur.lastrowid
+
+        insert_recipe_steps(cur, recipe_id, recipe_dict)
+        touched_ids.append(recipe_id)
+
+    # whatever was not matched is gone from the file
+    deleted_ids = [rid for ids in existing_ids.values() for rid in ids]
+
+    cur.execute("""
+        INSERT INTO ingest_manifest (source_file, file_size, file_mtime, content_hash, ingested_datetime)
+        VALUES (?,?,?,?,?)
+        ON CONFLICT (source_file) DO UPDATE SET
+           file_size = excluded.file_size
+          ,file_mtime = excluded.file_mtime
+          ,content_hash = excluded.content_hash
+          ,ingested_datetime = excluded.ingested_datetime
+        """,
+        (source_file, file_size, file_mtime, content_hash, add_time)
+    )
+
+    return touched_ids, deleted_ids
 
+
+def touch_ingest_manifest(con, touched_files):
+    """
+    Record a new size/mtime for source files whose content is unchanged.
+    touched_files is a list of (source_file, file_size, file_mtime).
+    """
+    cur = con.cursor()
+    cur.executemany(
+        "UPDATE ingest_manifest SET file_size = ?, file_mtime = ? WHERE source_file = ?",
+        [(file_size, file_mtime, source_file) for source_file, file_size, file_mtime in touched_files]
+    )
     con.commit()
 
 
+# pragmas trading durability for speed while bulk loading
+LOAD_PRAGMAS = {
+    "synchronous": "OFF",
+    "journal_mode": "MEMORY",
+}
+
+
+def set_pragmas(con, pragmas):
+    """
+    Apply the given pragmas and return their previous values.
+    """
+    cur = con.cursor()
+    previous = dict()
+    for pragma, value in pragmas.items():
+        previous[pragma] = cur.execute(f"PRAGMA {pragma}").fetchone()[0]
+        try:
+            cur.execute(f"PRAGMA {pragma} = {value}")
+        except sqlite3.OperationalError:
+            # e.g. journal_mode cannot leave WAL while others are connected
+            del previous[pragma]
+
+    return previous
+
+
+def update_db(con, extracted_recipes, batch_size=None, load_pragmas=False):
+    """
+    Bulk insert the extracted recipes whose (recipe_name, source_file) pair
+    is not in the db yet.
+
+    extracted_recipes may be any iterable, e.g. a generator streaming out
+    of extract.iter_extracted_recipes. Everything is written in a single
+    transaction, or one per batch_size recipes if given, with ingredient
+    and direction rows sent through executemany. load_pragmas=True relaxes
+    durability (see LOAD_PRAGMAS) for the duration of the load.
+    """
+    cur = con.cursor()
+
+    # list to hold existing recipes
+    cur.execute("select recipe_name, source_file from recipes")
+    existing_recipes = set(cur.fetchall())
+
+    n_inserted = 0
+    new_recipe_ids = []
+    ingredient_records = []
+    direction_records = []
+    search_records = []
+
+    def flush():
+        cur.executemany(INSERT_INGREDIENT_SQL, ingredient_records)
+        cur.executemany(INSERT_DIRECTION_SQL, direction_records)
+
+        # keep the full-text and ingredient indexes in sync with the new recipes
+        cur.executemany(INSERT_SEARCH_SQL, search_records)
+        refresh_ingredient_terms(
+            cur, new_recipe_ids, items=[(record[0], record[6]) for record in ingredient_records],
+            new=True
+        )
+
+        # let readers know the catalog changed, with the batch that changed it
+        if new_recipe_ids:
+            bump_meta_value(cur, "catalog_version")
+        cur.execute("COMMIT")
+
+        new_recipe_ids.clear()
+        ingredient_records.clear()
+        direction_records.clear()
+        search_records.clear()
+
+    previous_pragmas = set_pragmas(con, LOAD_PRAGMAS) if load_pragmas else {}
+
+    try:
+        cur.execute("BEGIN")
+
+        for recipe_dict in extracted_recipes:
+            # only create new recipes
+            if 'title' not in recipe_dict.keys():
+                continue
+
+            recipe_key = (recipe_dict['title'], recipe_dict['source_file'])
+            if recipe_key in existing_recipes:
+                continue
+            existing_recipes.add(recipe_key)
+
+            cur.execute(
+                "INSERT INTO recipes (recipe_name, prep_time, cook_time, servings, source_url, source_file) VALUES (?,?,?,?,?,?)",
+                (recipe_dict['title'], recipe_dict.get('prep-time'), recipe_dict.get('cook-time'),
+                 recipe_dict.get('servings'), recipe_dict.get('source-url'), recipe_dict['source_file'])
+            )
+            recipe_id = cur.lastrowid
+            new_recipe_ids.append(recipe_id)
+
+            ingredients, directions = recipe_step_records(recipe_id, recipe_dict)
+            ingredient_records.extend(ingredients)
+            direction_records.extend(directions)
+            search_records.append(recipe_search_record(recipe_id, recipe_dict))
+
+            n_inserted += 1
+            if batch_size and len(new_recipe_ids) >= batch_size:
+                flush()
+                cur.execute("BEGIN")
+
+        flush()
+    except:
+        if con.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+    finally:
+        set_pragmas(con, previous_pragmas)
+
+    return n_inserted
+
+
 if __name__ == "__main__":
     from pathlib import Path
     from app import app
@@ -1,146 +1,305 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import hashlib
 import re
 import sqlite3
 
 
-def extract_level(content: str, level: int):
-    if level == 1:
-        section_re_str = r"(?:\*\s).+?(?=\n\*\s|\Z)$"
-    else:
-        section_re_str = fr'^\*{{{level}}}\s.+?(?=\n\*{{1,{level}}}\s|\Z)'
+HEADING_RE = re.compile(r"(\*+)\s")
+ITEM_RE = re.compile(r"-\s")
+STEP_RE = re.compile(r"\d+\.\s")
+PROPERTY_RE = re.compile(r":(.+?):")
 
-    section_re = re.compile(section_re_str, re.MULTILINE|re.DOTALL)
-    rslt = re.findall(section_re, content)
 
-    return rslt
+def tokenize_org(lines):
+    """
+    Classify each non-blank line of an org file in a single pass.
 
+    Yields (kind, value, line) tuples where kind is one of 'heading' (value
+    is (level, name)), 'drawer-start', 'drawer-end', 'property' (value is
+    (key, value)), 'item' and 'step' (value is the text after the bullet or
+    number) or 'text'. `lines` may be any iterable, e.g. an open file.
+    """
+    in_drawer = False
 
-def extract_level_name(content: str, level: int):
-    level_name_re = fr"(?<=\*{{{level}}}\s)(.+?)\n"
-    level_name = re.findall(level_name_re, content, re.IGNORECASE)
+    for line in lines:
+        line = line.strip().replace(u'\xa0', u' ')
+        if not line:
+            continue
 
-    if level_name is None:
-        return ""
-    else:
-        return level_name[0]
+        lowered = line.lower()
 
+        if in_drawer:
+            if lowered == ":end:":
+                in_drawer = False
+                yield ('drawer-end', None, line)
+                continue
 
-def extract_properties(content: str):
-    properties = dict()
-
-    # find property blocks
-    properties_block_re = re.compile(
-        r"(?<=:properties:)(.+?)(?=:end:)",
-        re.IGNORECASE|re.DOTALL|re.MULTILINE
-    )
-    property_blocks = re.findall(properties_block_re, content)
-
-    # extract properties
-    prop_re = r":(?!properties)(?!end).+?:"
-
-    for block in property_blocks:
-        content_rows = block.split("\n")
-        for row in content_rows:
-            property_match = re.match(prop_re, row, re.IGNORECASE)
+            property_match = PROPERTY_RE.match(line)
             if property_match:
-                prop = re.sub(prop_re, '', row, re.IGNORECASE)
-                prop_val = prop.strip()
-                if prop:
-                    prop_key = property_match[0].replace(":", "")
-                    properties[prop_key] = prop_val
-
-    return properties
-
-
-def extract_ingredients(content: str):
-    ingredient_re_str = r"(?:^\s*-\s)(.+?)(?=\n\s*-\s|\Z)"
-    sub_sub_levels = extract_level(content, 3)
+                prop_key = property_match[1]
+                prop_val = line[property_match.end():].strip()
+                if prop_val and not prop_key.lower().startswith(("properties", "end")):
+                    yield ('property', (prop_key, prop_val), line)
+            continue
+
+        if lowered == ":properties:":
+            in_drawer = True
+            yield ('drawer-start', None, line)
+            continue
+
+        heading_match = HEADING_RE.match(line)
+        if heading_match:
+            yield ('heading', (len(heading_match[1]), line[heading_match.end():]), line)
+            continue
+
+        item_match = ITEM_RE.match(line)
+        if item_match:
+            yield ('item', line[item_match.end():], line)
+            continue
+
+        step_match = STEP_RE.match(line)
+        if step_match:
+            yield ('step', line[step_match.end():], line)
+            continue
+
+        yield ('text', None, line)
+
+
+class RecipeBuilder:
+    """
+    Collects the tokens of one top-level heading into a recipe dict.
+    """
+
+    def __init__(self, source_file, title):
+        self.recipe_content = dict(source_file=source_file, title=title)
+        self.section = None
+        self.grouped_ingredients = []
+        self.ungrouped_ingredients = []
+        self.ingredient_group = None
+        self.ingredients = None
+        self.directions = None
+        self.current = None
+
+    def start_section(self, name):
+        self.current = None
+        self.ingredient_group = None
+        self.section = name.lower()
+
+        # only the first section of each kind is kept
+        if self.section == 'ingredients' and self.ingredients is None:
+            self.ingredients = []
+        elif self.section == 'directions' and self.directions is None:
+            self.directions = []
+        else:
+            self.section = None
+
+    def add(self, kind, value, line):
+        if self.section == 'ingredients':
+            if kind == 'heading' and value[0] == 3:
+                # a sub-sub-level groups the ingredients below it
+                self.current = None
+                self.ingredient_group = value[1]
+            elif kind == 'item':
+                self.current = [value]
+                if self.ingredient_group is None:
+                    self.ungrouped_ingredients.append((None, self.current))
+                else:
+                    self.grouped_ingredients.append((self.ingredient_group, self.current))
+            elif self.current is not None:
+                self.current.append(line)
+
+        elif self.section == 'directions':
+            if kind == 'step':
+                self.current = [value]
+                self.directions.append(self.current)
+            elif self.current is not None:
+                self.current.append(line)
+
+    def build(self):
+        recipe_content = self.recipe_content
+
+        if self.ingredients is not None:
+            recipe_content['ingredients'] = [
+                (group, " ".join(parts).replace("  ", " ").strip())
+                for group, parts in self.grouped_ingredients + self.ungrouped_ingredients
+            ]
+
+        if self.directions is not None:
+            recipe_content['directions'] = [
+                "\n".join(parts).strip() for parts in self.directions
+            ]
+
+        return recipe_content
+
+
+def extract_recipes(lines, source_file):
+    """
+    Parse org-mode lines into a list of recipe dicts, one per top-level
+    heading, in linear time.
+    """
+    all_recipes = []
+    builder = None
+
+    for kind, value, line in tokenize_org(lines):
+        if kind == 'heading' and value[0] == 1:
+            if builder is not None:
+                all_recipes.append(builder.build())
+            builder = RecipeBuilder(source_file, value[1])
+            continue
+
+        # ignore anything before the first recipe
+        if builder is None:
+            continue
+
+        if kind == 'property':
+            builder.recipe_content[value[0]] = value[1]
+        elif kind in ('drawer-start', 'drawer-end'):
+            continue
+        elif kind == 'heading' and value[0] == 2:
+            builder.start_section(value[1])
+        else:
+            builder.add(kind, value, line)
+
+    if builder is not None:
+        all_recipes.append(builder.build())
 
-    ingredients = []
-    if sub_sub_levels:
-        for ssl in sub_sub_levels:
-            # remove sub-sub-level from the input-content
-            content = content.replace(ssl, "")
-            ssl_name = extract_level_name(ssl, 3)
-            ssl_ingredients = re.findall(ingredient_re_str, ssl, re.MULTILINE|re.DOTALL)
-            ingredients.extend([
-                (ssl_name, ingr.replace("\n", " ").replace("  ", " ")) for ingr in ssl_ingredients
-            ])
+    return all_recipes
 
-    # process sub-level ingredients (not subordinate to any sub-levels)
-    sl_ingredients = re.findall(ingredient_re_str, content, re.MULTILINE|re.DOTALL)
-    ingredients.extend([
-        (None, ingr.replace("\n", " ").replace("  ", " ")) for ingr in sl_ingredients
-    ])
 
-    return ingredients
+def extract_data(fp):
+    fp = Path(fp)
 
+    with open(fp, "r") as f:
+        return extract_recipes(f, fp.name)
 
-def extract_directions(content: str):
-    directions_re_str = r"(?:^\s*\d+\.\s)(.+?)(?=\n\s*\d+\.\s|\Z)"
-    rslts = re.findall(directions_re_str, content, re.MULTILINE|re.DOTALL)
 
-    return rslts
+def iter_extracted_files(fps, workers=1, max_pending=None):
+    """
+    Yield (fp, extracted_recipes) for each file in fps, in order.
 
+    With workers > 1 the files are parsed by a process pool. At most
+    max_pending files (default 4 per worker) are in flight at once, so
+    memory stays bounded however many files fps produces.
+    """
+    if workers is None or workers <= 1:
+        for fp in fps:
+            yield fp, extract_data(fp) or []
+        return
 
-def extract_data(fp):
-    content_dict = dict()
+    if max_pending is None:
+        max_pending = 4 * workers
 
-    fp = Path(fp)
-    source_file = fp.name
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for fp in fps:
+            pending.append((fp, executor.submit(extract_data, fp)))
+            if len(pending) >= max_pending:
+                fp_done, future = pending.popleft()
+                yield fp_done, future.result() or []
 
-    with open(fp, "r") as f:
-        content_rows = [r.strip().replace(u'\xa0', u' ') \
-                        for r in list(f.readlines())]
-        content_rows = [c for c in content_rows if len(c) > 0]
+        while pending:
+            fp_done, future = pending.popleft()
+            yield fp_done, future.result() or []
 
-    if not content_rows:
-        return content_dict
 
-    content = "\n".join(content_rows)
-    recipes = extract_level(content, 1)
+def iter_extracted_recipes(fps, workers=1, max_pending=None):
+    for _, extracted_recipes in iter_extracted_files(fps, workers, max_pending):
+        yield from extracted_recipes
 
-    all_recipes = []
 
-    for recipe in recipes:
-        recipe_content = dict()
-        recipe = recipes[0]
+def extract_recipes_from_fps(fps, workers=1):
+    # list to hold extracted results
+    return list(iter_extracted_recipes(fps, workers))
 
-        recipe_content['source_file'] = source_file
 
-        recipe_content['title']= extract_level_name(recipe, 1)
+def hash_file(fp):
+    sha = hashlib.sha256()
+    with open(fp, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            sha.update(chunk)
 
-        recipe_content.update(extract_properties(recipe))
+    return sha.hexdigest()
 
-        sub_sections = extract_level(recipe, 2)
-        sub_section_names = [extract_level_name(ss, 2).lower() for ss in sub_sections]
 
-        if 'ingredients' in sub_section_names:
-            ingredients_block = sub_sections[sub_section_names.index('ingredients')]
-            recipe_content['ingredients'] = extract_ingredients(ingredients_block)
+def ingest_changed_files(con, fps, workers=1, batch_size=None):
+    """
+    Re-extract only the source files that changed since the last ingest,
+    according to the ingest_manifest table, and sync them into the db.
 
-        if 'directions' in sub_section_names:
-            directions_block = sub_sections[sub_section_names.index('directions')]
-            recipe_content['directions'] = extract_directions(directions_block)
+    Files whose size and mtime match the manifest are skipped without being
+    read; files whose content hash still matches only get their manifest
+    row touched. Source files no longer present in fps are removed.
 
-        all_recipes.append(recipe_content)
+    Changed files are parsed by `workers` processes and streamed into
+    dbtools.sync_source_files, committing every batch_size files if given.
+    """
+    import dbtools as dbt
 
-    return all_recipes
+    manifest = dbt.get_ingest_manifest(con)
+    seen_files = set()
+    touched_files = []
+    file_stats = dict()
+
+    def changed_fps():
+        for fp in fps:
+            fp = Path(fp)
+            source_file = fp.name
+            seen_files.add(source_file)
+
+            stat = fp.stat()
+            file_size, file_mtime = stat.st_size, stat.st_mtime
+            known = manifest.get(source_file)
+            if known and known[0] == file_size and known[1] == file_mtime:
+                continue
+
+            content_hash = hash_file(fp)
+            if known and known[2] == content_hash:
+                touched_files.append((source_file, file_size, file_mtime))
+                continue
+
+            file_stats[fp] = (file_size, file_mtime, content_hash)
+            yield fp
+
+    def changed_files():
+        for fp, extracted_recipes in iter_extracted_files(changed_fps(), workers):
+            file_size, file_mtime, content_hash = file_stats.pop(fp)
+            yield (fp.name, extracted_recipes, file_size, file_mtime, content_hash)
+
+    # files must be scanned before the removed ones are known
+    touched_ids, deleted_ids = dbt.sync_source_files(
+        con, changed_files(), batch_size=batch_size
+    )
 
+    dbt.touch_ingest_manifest(con, touched_files)
 
-def extract_recipes_from_fps(fps):
-    # list to hold extracted results
-    extracted_recipes = []
-    for fp in fps:
-        extracted_recipes.extend(extract_data(fp))
+    removed_files = [sf for sf in manifest if sf not in seen_files]
+    if removed_files:
+        _, removed_ids = dbt.sync_source_files(con, [], removed_files)
+        deleted_ids.extend(removed_ids)
 
-    return extracted_recipes
+    return touched_ids, deleted_ids
 
 
 if __name__ == "__main__":
+    import argparse
+    import os
     import sqlite3
     from app import app
     import dbtools as dbt
+    import similar
+
+    parser = argparse.ArgumentParser(description="Load content/*.org into the recipe db")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(),
+        help="number of processes parsing org files (1 parses in-process)"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=500,
+        help="number of files written per transaction"
+    )
+    args = parser.parse_args()
 
     root_dir = Path(app.root_path)/".."
     data_dir_in  = root_dir/"content"
@@ -149,12 +308,18 @@ if __name__ == "__main__":
     # ensure output data dir exists
     data_dir_out.mkdir(exist_ok=True, parents=True)
 
-    # list to hold extracted results
-    fps = data_dir_in.glob(f"*.org")
-    extracted_recipes = extract_recipes_from_fps(fps)
-
     # load to db - ensure db exists!
     con = sqlite3.connect(data_dir_out/f'recipe.db')
     dbt.create_db(con)
-    dbt.update_db(con, extracted_recipes)
+
+    # only re-extract the files that changed since the last run
+    fps = data_dir_in.glob(f"*.org")
+    touched_ids, deleted_ids = ingest_changed_files(
+        con, fps, workers=args.workers, batch_size=args.batch_size
+    )
+    print(f"Updated {len(touched_ids)} recipes, removed {len(deleted_ids)} recipes")
+
+    # only the recipes whose content changed, and their neighbors
+    n_changed, n_recomputed = similar.refresh_recipe_neighbors(con)
+    print(f"Recomputed similar recipes for {n_recomputed} recipes")
     con.close()
@@ -0,0 +1,194 @@
+from fractions import Fraction
+import re
+
+
+UNICODE_FRACTIONS = {
+    "½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4",
+    "⅕": "1/5", "⅖": "2/5", "⅗": "3/5", "⅘": "4/5", "⅙": "1/6",
+    "⅚": "5/6", "⅛": "1/8", "⅜": "3/8", "⅝": "5/8", "⅞": "7/8",
+}
+
+# spelling -> normalized unit
+UNIT_ALIASES = {
+    "cup": "cup", "cups": "cup", "c": "cup",
+    "tablespoon": "tbsp", "tablespoons": "tbsp", "tbsp": "tbsp", "tbs": "tbsp", "tbl": "tbsp",
+    "teaspoon": "tsp", "teaspoons": "tsp", "tsp": "tsp",
+    "ounce": "oz", "ounces": "oz", "oz": "oz",
+    "fl oz": "fl oz", "fluid ounce": "fl oz", "fluid ounces": "fl oz",
+    "pound": "lb", "pounds": "lb", "lb": "lb", "lbs": "lb",
+    "gram": "g", "grams": "g", "g": "g",
+    "kilogram": "kg", "kilograms": "kg", "kg": "kg",
+    "milliliter": "ml", "milliliters": "ml", "ml": "ml",
+    "liter": "l", "liters": "l", "litre": "l", "litres": "l", "l": "l",
+    "pint": "pint", "pints": "pint", "pt": "pint",
+    "quart": "quart", "quarts": "quart", "qt": "quart",
+    "gallon": "gallon", "gallons": "gallon", "gal": "gallon",
+    "clove": "clove", "cloves": "clove",
+    "can": "can", "cans": "can",
+    "package": "package", "packages": "package", "pkg": "package",
+    "stick": "stick", "sticks": "stick",
+    "slice": "slice", "slices": "slice",
+    "pinch": "pinch", "pinches": "pinch",
+    "dash": "dash", "dashes": "dash",
+    "bunch": "bunch", "bunches": "bunch",
+    "sprig": "sprig", "sprigs": "sprig",
+    "head": "head", "heads": "head",
+}
+
+# units written as abbreviations are not pluralized for display
+ABBREVIATED_UNITS = {"tbsp", "tsp", "oz", "fl oz", "lb", "g", "kg", "ml", "l"}
+
+# words describing how an item is prepared, dropped from the item name
+DESCRIPTORS = {
+    "large", "medium", "small", "fresh", "chopped", "minced", "diced",
+    "sliced", "grated", "shredded", "melted", "softened", "packed",
+    "finely", "roughly", "thinly", "ground",
+}
+
+# words that never make a useful ingredient search term on their own
+TERM_STOPWORDS = {"of", "and", "or", "for", "to", "a", "the", "with", "in"}
+
+QUANTITY_RE = re.compile(
+    r"^(\d+\s+\d+/\d+|\d+/\d+|\d*\.\d+|\d+)"         # 1 1/2, 1/2, .5, 1.5, 2
+    r"(?:\s*(?:-|to)\s*(?:\d+\s+\d+/\d+|\d+/\d+|\d*\.\d+|\d+))?"  # ranges
+    r"\s*"
+)
+PAREN_RE = re.compile(r"\([^)]*\)")
+WORD_RE = re.compile(r"[a-z][a-z'-]*")
+
+
+def parse_quantity(text: str):
+    # plain float arithmetic; Fraction() is several times slower and this
+    # runs for every ingredient line at ingest
+    total = 0.0
+    for part in text.split():
+        numerator, slash, denominator = part.partition("/")
+        if slash:
+            total += int(numerator) / int(denominator)
+        else:
+            total += float(part)
+
+    return total
+
+
+def singularize(word: str):
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("oes") and len(word) > 4:
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us")) and len(word) > 3:
+        return word[:-1]
+
+    return word
+
+
+def normalize_item(text: str):
+    """
+    Reduce an ingredient description to a grouping key, e.g.
+    "Tomatoes, chopped" and "2 large tomato" both become "tomato".
+    """
+    text = PAREN_RE.sub(" ", text.lower()).split(",")[0]
+    words = [w for w in WORD_RE.findall(text) if w not in DESCRIPTORS]
+    if words and words[0] == "of":
+        words = words[1:]
+    if not words:
+        return None
+
+    words[-1] = singularize(words[-1])
+
+    return " ".join(words)
+
+
+def ingredient_terms(item: str):
+    """
+    Return the search terms of a normalized item name (see normalize_item):
+    the item itself plus each of its words, e.g. "lemon juice" gives
+    {"lemon juice", "lemon", "juice"}.
+    """
+    if not item:
+        return set()
+
+    terms = {singularize(w) for w in item.split() if w not in TERM_STOPWORDS}
+    terms.add(item)
+
+    return terms
+
+
+def parse_ingredient(ingredient: str):
+    """
+    Split an ingredient line into (quantity, unit, item).
+
+    quantity is a float (ranges keep their lower bound) or None when the
+    line does not start with an amount, unit is a normalized unit name or
+    None, and item is the normalized item name (see normalize_item).
+    """
+    text = ingredient.strip()
+    if not text.isascii():
+        for symbol, fraction in UNICODE_FRACTIONS.items():
+            text = text.replace(symbol, " " + fraction)
+        text = text.strip()
+    if "(" in text:
+        text = PAREN_RE.sub(" ", text).strip()
+
+    quantity_match = QUANTITY_RE.match(text)
+    if not quantity_match:
+        return None, None, normalize_item(text)
+
+    try:
+        quantity = parse_quantity(quantity_match[1])
+    except (ValueError, ZeroDivisionError):
+        return None, None, normalize_item(text)
+
+    rest = text[quantity_match.end():]
+    unit = None
+    words = rest.split()
+    for n_words in (2, 1):
+        candidate = " ".join(words[:n_words]).lower().rstrip(".")
+        if len(words) >= n_words and candidate in UNIT_ALIASES:
+            unit = UNIT_ALIASES[candidate]
+            rest = " ".join(words[n_words:])
+            break
+
+    return quantity, unit, normalize_item(rest)
+
+
+def format_quantity(quantity: float):
+    """
+    Format a quantity as a whole number plus a kitchen fraction, e.g. 1.5 as
+    "1 1/2".
+    """
+    fraction = Fraction(quantity).limit_denominator(8)
+    whole, remainder = divmod(fraction, 1)
+
+    if remainder == 0:
+        return str(whole)
+    if whole == 0:
+        return str(remainder)
+
+    return f"{whole} {remainder}"
+
+
+def pluralize(word: str):
+    if word in ABBREVIATED_UNITS:
+        return word
+    if word.endswith(("ch", "sh", "s", "x", "o")):
+        return word + "es"
+    if word.endswith("y") and word[-2:-1] not in "aeiou":
+        return word[:-1] + "ies"
+
+    return word + "s"
+
+
+def describe_ingredient(quantity: float, unit: str, item: str):
+    """
+    Render an aggregated (quantity, unit, item) back into a grocery line.
+    """
+    plural = quantity > 1
+    parts = [format_quantity(quantity)]
+    if unit:
+        parts.append(pluralize(unit) if plural else unit)
+        parts.append(item)
+    else:
+        parts.append(pluralize(item) if plural else item)
+
+    return " ".join(parts)
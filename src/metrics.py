@@ -0,0 +1,270 @@
+from bisect import bisect_left
+import contextvars
+import sqlite3
+import threading
+import time
+
+
+# request latency buckets, in seconds
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# SQL statements run by one request
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus style. Not thread-safe on
+    its own; Metrics holds the lock.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class QueryStats:
+    """
+    SQL statements and time spent in SQLite by one request.
+    """
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# the QueryStats of the request running in this context, if any
+current_query_stats = contextvars.ContextVar("current_query_stats", default=None)
+
+# called as hook(connection, sql, parameters, seconds) once each statement
+# run through an InstrumentedCursor has finished (see slowlog.py); seconds
+# covers executing the statement and fetching all of its rows
+statement_hooks = []
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that charges the time spent executing statements and stepping
+    through their rows to the current request's QueryStats, and reports
+    each finished statement to the statement_hooks.
+    """
+
+    # [sql, parameters, seconds] of the statement whose rows are being read,
+    # while there are statement_hooks
+    _statement = None
+
+    def _finish_statement(self):
+        statement = self._statement
+        if statement is not None:
+            self._statement = None
+            for hook in statement_hooks:
+                hook(self.connection, *statement)
+
+    def _timed(self, method, *args):
+        stats = current_query_stats.get()
+        if stats is None and self._statement is None:
+            return method(self, *args)
+
+        start = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            if stats is not None:
+                stats.seconds += elapsed
+            if self._statement is not None:
+                self._statement[2] += elapsed
+
+    def _timed_statement(self, method, sql, parameters):
+        self._finish_statement()
+
+        stats = current_query_stats.get()
+        if stats is None and not statement_hooks:
+            return method(self, sql, parameters)
+
+        start = time.perf_counter()
+        try:
+            return method(self, sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            if stats is not None:
+                stats.queries += 1
+                stats.seconds += elapsed
+            if statement_hooks:
+                self._statement = [sql, parameters, elapsed]
+                # statements without result rows are done already
+                if self.description is None:
+                    self._finish_statement()
+
+    def execute(self, sql, parameters=()):
+        return self._timed_statement(sqlite3.Cursor.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed_statement(sqlite3.Cursor.executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        self._finish_statement()
+        return self._timed(sqlite3.Cursor.executescript, sql_script)
+
+    def fetchone(self):
+        row = self._timed(sqlite3.Cursor.fetchone)
+        if row is None:
+            self._finish_statement()
+        return row
+
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self.arraysize
+        rows = self._timed(sqlite3.Cursor.fetchmany, size)
+        if len(rows) < size:
+            self._finish_statement()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(sqlite3.Cursor.fetchall)
+        self._finish_statement()
+        return rows
+
+    def __next__(self):
+        try:
+            return self._timed(sqlite3.Cursor.__next__)
+        except StopIteration:
+            self._finish_statement()
+            raise
+
+    def close(self):
+        self._finish_statement()
+        super().close()
+
+    def __del__(self):
+        # report statements whose rows were never read to the end
+        if self._statement is not None:
+            try:
+                self._finish_statement()
+            except Exception:
+                pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors, including the ones behind the execute()
+    shortcuts, are InstrumentedCursors. Pass as `factory` to
+    sqlite3.connect.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels) + "}"
+
+
+class Metrics:
+    """
+    Per-process request metrics: a latency histogram and SQL totals per
+    route, rendered in the Prometheus text exposition format. With several
+    worker processes, each exposes its own numbers.
+    """
+
+    def __init__(self, prefix: str = "recipe_site"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._requests = dict()  # (route, method, status) -> count
+        self._latency = dict()  # route -> Histogram
+        self._queries = dict()  # route -> Histogram
+        self._sql_seconds = dict()  # route -> total seconds
+
+    def observe_request(self, route, method, status, seconds, query_stats=None):
+        with self._lock:
+            key = (route, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+            latency = self._latency.get(route)
+            if latency is None:
+                latency = self._latency[route] = Histogram(LATENCY_BUCKETS)
+            latency.observe(seconds)
+
+            if query_stats is not None:
+                queries = self._queries.get(route)
+                if queries is None:
+                    queries = self._queries[route] = Histogram(QUERY_COUNT_BUCKETS)
+                queries.observe(query_stats.queries)
+                self._sql_seconds[route] = self._sql_seconds.get(route, 0.0) + query_stats.seconds
+
+    def _histogram_lines(self, name, histograms):
+        for route, histogram in sorted(histograms.items()):
+            for bound, count in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{name}_bucket{format_labels([('route', route), ('le', le)])} {count}"
+            yield f"{name}_sum{format_labels([('route', route)])} {histogram.sum}"
+            yield f"{name}_count{format_labels([('route', route)])} {histogram.count}"
+
+    def render(self, gauges=None):
+        """
+        Return the metrics as Prometheus text. `gauges` maps extra metric
+        names to values (e.g. pool and cache stats) sampled by the caller.
+        """
+        p = self.prefix
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {p}_requests_total Requests handled, by route, method and status.")
+            lines.append(f"# TYPE {p}_requests_total counter")
+            for (route, method, status), count in sorted(self._requests.items()):
+                labels = [("route", route), ("method", method), ("status", status)]
+                lines.append(f"{p}_requests_total{format_labels(labels)} {count}")
+
+            lines.append(f"# HELP {p}_request_duration_seconds Request latency, by route.")
+            lines.append(f"# TYPE {p}_request_duration_seconds histogram")
+            lines.extend(self._histogram_lines(f"{p}_request_duration_seconds", self._latency))
+
+            lines.append(f"# HELP {p}_request_sql_queries SQL statements per request, by route.")
+            lines.append(f"# TYPE {p}_request_sql_queries histogram")
+            lines.extend(self._histogram_lines(f"{p}_request_sql_queries", self._queries))
+
+            lines.append(f"# HELP {p}_sql_seconds_total Time spent in SQLite, by route.")
+            lines.append(f"# TYPE {p}_sql_seconds_total counter")
+            for route, seconds in sorted(self._sql_seconds.items()):
+                lines.append(f"{p}_sql_seconds_total{format_labels([('route', route)])} {seconds}")
+
+        for name, value in (gauges or dict()).items():
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                lines.append(f"# TYPE {p}_{name} gauge")
+                lines.append(f"{p}_{name} {value}")
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+import threading
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by entry count and by the
+    total size of the cached values.
+
+    Entries belong to a generation (e.g. the catalog version); moving to a
+    new generation drops everything cached for the old one.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = None
+        self._bytes = 0
+        self._stats = dict(hits=0, misses=0, evictions=0, invalidations=0)
+
+    def set_generation(self, generation):
+        with self._lock:
+            if generation != self._generation:
+                if self._entries:
+                    self._stats["invalidations"] += 1
+                self._entries.clear()
+                self._bytes = 0
+                self._generation = generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+
+            return entry[0]
+
+    def put(self, key, value, size: int):
+        # too big to ever fit
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_entries=self.max_entries,
+                max_bytes=self.max_bytes,
+                generation=self._generation,
+            )
@@ -0,0 +1,74 @@
+import mimetypes
+import os
+from pathlib import Path
+from compression import (
+    COMPRESSIBLE_MIMETYPES, PRECOMPRESSED_SUFFIXES, compress
+)
+
+
+def iter_static_files(static_dir: Path):
+    suffixes = tuple(PRECOMPRESSED_SUFFIXES.values())
+    for fp in sorted(static_dir.rglob("*")):
+        if not fp.is_file() or fp.name.endswith(suffixes):
+            continue
+        mimetype, _ = mimetypes.guess_type(fp.name)
+        if mimetype in COMPRESSIBLE_MIMETYPES:
+            yield fp
+
+
+def precompress_file(fp: Path, force: bool = False):
+    """
+    Write a compressed sibling of fp for each available encoding, skipping
+    siblings that are already newer than fp. Returns the paths written.
+    """
+    mtime = fp.stat().st_mtime
+    data = None
+    written = []
+    for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+        sibling = Path(str(fp) + suffix)
+        if not force and sibling.exists() and sibling.stat().st_mtime >= mtime:
+            continue
+
+        if data is None:
+            data = fp.read_bytes()
+        compressed = compress(data, encoding)
+
+        # only worth serving if it is actually smaller
+        if len(compressed) >= len(data):
+            sibling.unlink(missing_ok=True)
+            continue
+
+        # write then rename, so the server never sees a partial file
+        tmp = sibling.with_name(sibling.name + ".tmp")
+        tmp.write_bytes(compressed)
+        os.replace(tmp, sibling)
+        written.append(sibling)
+
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    root_dir = Path(__file__).resolve().parent/".."
+
+    parser = argparse.ArgumentParser(
+        description="Write precompressed siblings (.gz, .br) of the static assets"
+    )
+    parser.add_argument(
+        "--static-dir", type=Path, default=root_dir/"static",
+        help="directory to precompress"
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="rewrite siblings even if they look up to date"
+    )
+    args = parser.parse_args()
+
+    n_written = 0
+    for fp in iter_static_files(args.static_dir):
+        written = precompress_file(fp, force=args.force)
+        for sibling in written:
+            print(f"Wrote {sibling.relative_to(args.static_dir)}")
+        n_written += len(written)
+    print(f"Wrote {n_written} precompressed files")
@@ -0,0 +1,314 @@
+"""
+Rebuild the catalog without disturbing the running site.
+
+data/recipe.db becomes a symlink to one generation of the db in
+data/generations/. A rebuild copies the live generation with the online
+backup API (a consistent snapshot, taken without blocking writers), syncs
+the content files into the copy, validates it, carries over any schedule
+writes made in the meantime and atomically repoints the symlink. Request
+workers notice the new target on their next checkout (see dbpool.py) and
+reopen; nothing ever drops or rewrites tables under a live reader.
+"""
+import logging
+import os
+from pathlib import Path
+import sqlite3
+import time
+import dbtools as dbt
+import extract
+import similar
+
+
+logger = logging.getLogger(__name__)
+
+GENERATIONS_DIR = "generations"
+
+# a rebuild that loses more than this share of the live recipes is refused
+# unless forced, e.g. when the content dir is half checked out
+DEFAULT_MIN_RECIPE_RATIO = 0.5
+
+# how long to wait for the live write lock before the swap
+LIVE_BUSY_TIMEOUT_MS = 10_000
+
+
+def list_generations(db_path):
+    """
+    Return the generation files next to db_path, oldest first.
+    """
+    db_path = Path(db_path)
+    generations_dir = db_path.parent/GENERATIONS_DIR
+
+    return sorted(generations_dir.glob(f"{db_path.stem}-*{db_path.suffix}"))
+
+
+def next_generation_path(db_path):
+    db_path = Path(db_path)
+    generations = list_generations(db_path)
+    n = int(generations[-1].stem.rsplit("-", 1)[1]) + 1 if generations else 1
+
+    return db_path.parent/GENERATIONS_DIR/f"{db_path.stem}-{n:06d}{db_path.suffix}"
+
+
+def backup_db(source_path, target_path):
+    """
+    Copy the db at source_path into a new file at target_path with the
+    online backup API, in one step so the copy is a single snapshot.
+    """
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def count_rows(cur, table):
+    return cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def validate_db(con, min_recipes: int = 0):
+    """
+    Check a rebuilt db before it goes live; return a list of problems,
+    empty if it is fit to serve.
+    """
+    cur = con.cursor()
+    problems = []
+
+    integrity = [row[0] for row in cur.execute("PRAGMA integrity_check").fetchall()]
+    if integrity != ["ok"]:
+        problems.append(f"integrity_check: {'; '.join(integrity[:5])}")
+
+    n_recipes = count_rows(cur, "recipes")
+    if n_recipes < min_recipes:
+        problems.append(f"only {n_recipes} recipes, expected at least {min_recipes}")
+
+    n_search = count_rows(cur, "recipe_search")
+    if n_search != n_recipes:
+        problems.append(f"{n_search} recipe_search rows for {n_recipes} recipes")
+
+    for table in ("ingredients", "directions"):
+        n_orphans = cur.execute(f"""
+        SELECT COUNT(*)
+        FROM {table}
+        WHERE recipe_id NOT IN (SELECT recipe_id FROM recipes)
+        """).fetchone()[0]
+        if n_orphans:
+            problems.append(f"{n_orphans} {table} rows without a recipe")
+
+    # recipes removed from the content leave their history behind; worth
+    # knowing about, but not a reason to refuse the rebuild
+    n_unknown = cur.execute("""
+    SELECT COUNT(DISTINCT recipe_id)
+    FROM recipe_schedule
+    WHERE recipe_id NOT IN (SELECT recipe_id FROM recipes)
+    """).fetchone()[0]
+    if n_unknown:
+        logger.warning("%d scheduled recipes are no longer in the catalog", n_unknown)
+
+    return problems
+
+
+def carry_over_schedule(shadow, live_path):
+    """
+    Copy the schedule into the shadow db again if it changed on the live
+    db since the backup. The caller holds the live write lock.
+    """
+    cur = shadow.cursor()
+    cur.execute("ATTACH DATABASE ? AS live", (str(live_path),))
+    try:
+        live_version = cur.execute(
+            "SELECT meta_value FROM live.catalog_meta WHERE meta_key = 'schedule_version'"
+        ).fetchone()
+        if live_version is None or live_version[0] == dbt.get_meta_value(cur, "schedule_version"):
+            return False
+
+        cur.execute("BEGIN")
+        for table in ("recipe_schedule", "recipe_stats"):
+            cur.execute(f"DELETE FROM main.{table}")
+            cur.execute(f"INSERT INTO main.{table} SELECT * FROM live.{table}")
+        cur.execute("""
+        INSERT OR REPLACE INTO main.catalog_meta
+        SELECT * FROM live.catalog_meta WHERE meta_key = 'schedule_version'
+        """)
+        cur.execute("COMMIT")
+    except:
+        if shadow.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+    finally:
+        cur.execute("DETACH DATABASE live")
+
+    return True
+
+
+def swap_in(db_path, generation_path):
+    """
+    Atomically point the db_path symlink at generation_path.
+    """
+    db_path = Path(db_path)
+    tmp_link = db_path.with_name(f".{db_path.name}.{os.getpid()}.tmp")
+    if tmp_link.is_symlink():
+        tmp_link.unlink()
+    tmp_link.symlink_to(os.path.relpath(generation_path, db_path.parent))
+    os.replace(tmp_link, db_path)
+
+
+def prune_generations(db_path, keep: int = 2):
+    """
+    Delete all but the newest `keep` generations (and their -wal and -shm
+    files); the older ones may still be open in workers for a moment after
+    a swap, so keep at least 2.
+    """
+    live = Path(os.path.realpath(db_path))
+    removed = []
+    for generation in list_generations(db_path)[:-keep]:
+        if generation == live:
+            continue
+        for suffix in ("-wal", "-shm", ""):
+            path = Path(f"{generation}{suffix}")
+            if path.exists():
+                path.unlink()
+        removed.append(generation)
+
+    return removed
+
+
+def rebuild_catalog(db_path, fps, workers: int = 1, batch_size=None, full: bool = False,
+                    keep: int = 2, min_recipe_ratio: float = DEFAULT_MIN_RECIPE_RATIO):
+    """
+    Sync fps into a shadow copy of the db at db_path and swap it in.
+
+    With full=True every source file is re-extracted, not just the ones
+    the ingest manifest says changed; recipe_ids are kept either way, so
+    the schedule history still points at the same recipes. Raises
+    RuntimeError, leaving the live db untouched, if the shadow db fails
+    validation.
+    """
+    start = time.perf_counter()
+    db_path = Path(db_path)
+    db_path.parent.joinpath(GENERATIONS_DIR).mkdir(parents=True, exist_ok=True)
+
+    shadow_path = next_generation_path(db_path)
+    live_path = Path(os.path.realpath(db_path))
+    was_symlink = db_path.is_symlink()
+    if live_path.exists():
+        backup_db(live_path, shadow_path)
+
+    shadow = sqlite3.connect(shadow_path)
+    try:
+        dbt.create_db(shadow)
+        cur = shadow.cursor()
+        n_live_recipes = count_rows(cur, "recipes")
+        if full:
+            # forget what was ingested, but not which files were, so files
+            # gone from the content dir are still removed
+            cur.execute("UPDATE ingest_manifest SET file_size = -1, content_hash = ''")
+            shadow.commit()
+
+        # nobody reads the shadow db yet, so durability can wait
+        dbt.set_pragmas(shadow, dbt.LOAD_PRAGMAS)
+        touched_ids, deleted_ids = extract.ingest_changed_files(
+            shadow, fps, workers=workers, batch_size=batch_size
+        )
+        similar.refresh_recipe_neighbors(shadow, full=full)
+        cur.execute("ANALYZE")
+        shadow.commit()
+
+        problems = validate_db(shadow, min_recipes=int(min_recipe_ratio * n_live_recipes))
+        if problems:
+            raise RuntimeError(f"rebuilt db {shadow_path} failed validation: {'; '.join(problems)}")
+
+        cur.execute("PRAGMA journal_mode = WAL")
+        cur.execute("PRAGMA synchronous = NORMAL")
+
+        if not live_path.exists():
+            swap_in(db_path, shadow_path)
+        else:
+            # hold the live write lock across the catch-up and the swap, so
+            # no schedule write can land in between; writers that were
+            # waiting on it find the new generation (see app.begin_write)
+            live = sqlite3.connect(live_path, timeout=LIVE_BUSY_TIMEOUT_MS / 1000)
+            try:
+                live.execute("BEGIN IMMEDIATE")
+                if carry_over_schedule(shadow, live_path):
+                    logger.info("Carried over schedule changes made during the rebuild")
+                swap_in(db_path, shadow_path)
+            finally:
+                live.rollback()
+                live.close()
+    except:
+        shadow.close()
+        for suffix in ("-wal", "-shm", "-journal", ""):
+            path = Path(f"{shadow_path}{suffix}")
+            if path.exists():
+                path.unlink()
+        raise
+
+    shadow.close()
+
+    removed = prune_generations(db_path, keep=keep)
+    if was_symlink:
+        # journal files left behind by the plain db file the first rebuild
+        # replaced (a symlinked db keeps them next to its target)
+        for suffix in ("-wal", "-shm"):
+            path = Path(f"{db_path}{suffix}")
+            if path.exists():
+                path.unlink()
+
+    summary = dict(
+        generation=shadow_path.name,
+        touched=len(touched_ids),
+        deleted=len(deleted_ids),
+        pruned=[path.name for path in removed],
+        seconds=round(time.perf_counter() - start, 3),
+    )
+    logger.info("Swapped in %s", summary)
+
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    from app import app
+
+    parser = argparse.ArgumentParser(
+        description="Rebuild the recipe db from content/*.org in a shadow copy and swap it in"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(),
+        help="number of processes parsing org files (1 parses in-process)"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=500,
+        help="number of files written per transaction"
+    )
+    parser.add_argument(
+        "--full", action="store_true",
+        help="re-extract every file, not just the ones that changed"
+    )
+    parser.add_argument("--keep", type=int, default=2, help="generations to keep on disk")
+    parser.add_argument(
+        "--force", action="store_true",
+        help="swap in even if the rebuild lost most of the recipes"
+    )
+    args = parser.parse_args()
+
+    root_dir = Path(app.root_path)/".."
+    data_dir_in  = root_dir/"content"
+    data_dir_out = root_dir/"data"
+    data_dir_out.mkdir(exist_ok=True, parents=True)
+
+    summary = rebuild_catalog(
+        data_dir_out/"recipe.db",
+        data_dir_in.glob("*.org"),
+        workers=args.workers,
+        batch_size=args.batch_size,
+        full=args.full,
+        keep=max(args.keep, 2),
+        min_recipe_ratio=0.0 if args.force else DEFAULT_MIN_RECIPE_RATIO,
+    )
+    print(
+        f"Swapped in {summary['generation']}: updated {summary['touched']} recipes, "
+        f"removed {summary['deleted']} recipes in {summary['seconds']}s"
+    )
@@ -0,0 +1,184 @@
+from collections import deque
+import logging
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import quote
+import dbtools as dbt
+
+
+logger = logging.getLogger(__name__)
+
+# tables the replica does not need; the schedule is always read from disk
+NON_CATALOG_TABLES = (
+    "recipe_schedule", "recipe_stats", "ingest_manifest", "recipe_neighbor_state",
+)
+
+
+class CatalogSnapshot:
+    """
+    One in-memory copy of the catalog, kept alive by its anchor connection.
+    """
+
+    __slots__ = ("uri", "version", "anchor")
+
+    def __init__(self, uri, version, anchor):
+        self.uri = uri
+        self.version = version
+        self.anchor = anchor
+
+
+class CatalogReplica:
+    """
+    Read-only, in-memory copy of the catalog tables (recipes, ingredients,
+    directions and the full-text index) for one process and its forks.
+
+    load() copies the db at db_path into a shared-cache memory db with the
+    backup API. Loaded in the uwsgi master before it forks, the workers
+    inherit the copy and share its pages copy-on-write; their connections
+    to it are opened after the fork, like the ConnectionPool's.
+
+    checkout(version) only hands out a connection if the replica holds that
+    catalog_version. Otherwise it returns None, so the caller reads from
+    disk, and reloads the replica on a background thread. A reload made in
+    a worker is private to that worker.
+    """
+
+    def __init__(self, db_path, max_idle: int = 8, factory=sqlite3.Connection):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.factory = factory
+
+        self._lock = threading.Lock()
+        self._n_loads = 0
+        self._snapshot = None
+        self._stats = dict(loads=0, load_seconds=0.0, checkouts=0, fallbacks=0)
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        # a reload running in the parent does not carry over a fork
+        self._refresh_lock = threading.Lock()
+        self._idle = deque()
+        self._con_snapshots = dict()  # connection -> snapshot it reads
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def load(self):
+        """
+        Copy the catalog from disk into a new memory db and switch to it.
+        Returns the catalog_version loaded.
+        """
+        start = time.perf_counter()
+        path = os.path.realpath(self.db_path)
+        with self._lock:
+            self._n_loads += 1
+            name = f"recipe-catalog-{os.getpid()}-{self._n_loads}"
+        uri = f"file:{name}?mode=memory&cache=shared"
+
+        anchor = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        source = sqlite3.connect(f"file:{quote(path)}?mode=ro", uri=True)
+        try:
+            source.backup(anchor)
+        finally:
+            source.close()
+
+        cur = anchor.cursor()
+        for table in NON_CATALOG_TABLES:
+            cur.execute(f"DROP TABLE IF EXISTS {table}")
+        version = dbt.get_catalog_version(cur)
+        cur.close()
+
+        with self._lock:
+            previous = self._snapshot
+            self._snapshot = CatalogSnapshot(uri, version, anchor)
+            stale = list(self._idle)
+            self._idle.clear()
+            self._stats["loads"] += 1
+            self._stats["load_seconds"] += time.perf_counter() - start
+
+        # connections still in use keep the old copy alive until checkin
+        for con in stale:
+            self._con_snapshots.pop(con, None)
+            con.close()
+        if previous is not None:
+            previous.anchor.close()
+
+        logger.info(
+            "Loaded catalog version %s into memory in %.2fs",
+            version, time.perf_counter() - start
+        )
+
+        return version
+
+    def _refresh(self):
+        try:
+            self.load()
+        except Exception:
+            logger.exception("Reloading the catalog replica failed")
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_in_background(self):
+        # one reload at a time; requests read from disk meanwhile
+        if self._refresh_lock.acquire(blocking=False):
+            threading.Thread(target=self._refresh, name="catalog-replica", daemon=True).start()
+
+    def checkout(self, version):
+        """
+        Return a read-only connection to the replica if it holds `version`
+        of the catalog, else None; give it back with checkin().
+        """
+        self._check_pid()
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                self._stats["fallbacks"] += 1
+                snapshot = None
+            else:
+                self._stats["checkouts"] += 1
+                if self._idle:
+                    return self._idle.pop()
+
+        if snapshot is None:
+            self.refresh_in_background()
+            return None
+
+        con = sqlite3.connect(
+            snapshot.uri, uri=True, check_same_thread=False, factory=self.factory
+        )
+        con.execute("PRAGMA query_only = ON")
+        self._con_snapshots[con] = snapshot
+
+        return con
+
+    def checkin(self, con):
+        if con.in_transaction:
+            con.rollback()
+        con.row_factory = None
+
+        with self._lock:
+            if (self._pid == os.getpid() and len(self._idle) < self.max_idle
+                    and self._con_snapshots.get(con) is self._snapshot):
+                self._idle.append(con)
+                return
+
+        self._con_snapshots.pop(con, None)
+        con.close()
+
+    def stats(self):
+        with self._lock:
+            snapshot = self._snapshot
+            stats = dict(
+                self._stats,
+                idle=len(self._idle),
+                version=snapshot.version if snapshot is not None else None,
+            )
+
+        return stats
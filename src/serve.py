@@ -0,0 +1,289 @@
+"""
+Standard-library-only local server for the recipe site, in either WSGI
+(threaded wsgiref) or ASGI (asyncio, see asgi.py) mode, plus a small load
+generator to compare the two on the same box:
+
+    python serve.py wsgi --port 8000
+    python serve.py asgi --port 8001
+    python serve.py loadtest http://localhost:8000/recipe-site/ --concurrency 16
+"""
+import asyncio
+import http.client
+from http import HTTPStatus
+import socketserver
+import threading
+import time
+from urllib.parse import urlsplit
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_wsgi(host: str, port: int, quiet: bool = False):
+    from wsgi import application
+
+    handler = QuietHandler if quiet else WSGIRequestHandler
+    with make_server(host, port, application, ThreadingWSGIServer, handler) as server:
+        print(f"Serving WSGI on http://{host}:{port}")
+        server.serve_forever()
+
+
+async def read_request(reader):
+    """
+    Read one HTTP/1.x request; return (method, target, version, headers,
+    body) or None at end of stream.
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    method, target, version = request_line.decode("latin-1").split()
+
+    headers = []
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers.append((name.strip().lower().encode("latin-1"), value.strip().encode("latin-1")))
+
+    content_length = int(dict(headers).get(b"content-length", 0))
+    body = await reader.readexactly(content_length) if content_length else b""
+
+    return method, target, version, headers, body
+
+
+async def handle_connection(asgi_app, host, port, reader, writer, quiet=False):
+    """
+    Drive asgi_app for the requests on one connection, keeping it open
+    between requests unless the client asks to close it.
+    """
+    client = writer.get_extra_info("peername")[:2]
+    try:
+        while True:
+            request = await read_request(reader)
+            if request is None:
+                break
+            method, target, version, headers, body = request
+            path, _, query_string = target.partition("?")
+            keep_alive = (
+                version == "HTTP/1.1"
+                and dict(headers).get(b"connection", b"").lower() != b"close"
+            )
+
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": version.split("/")[1],
+                "method": method,
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode("latin-1"),
+                "query_string": query_string.encode("latin-1"),
+                "root_path": "",
+                "headers": headers,
+                "client": client,
+                "server": (host, port),
+            }
+            received = False
+
+            async def receive():
+                nonlocal received
+                if received:
+                    return {"type": "http.disconnect"}
+                received = True
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            status = None
+            chunked = False
+
+            async def send(message):
+                nonlocal status, chunked
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    response_headers = message.get("headers", [])
+                    names = {name.lower() for name, _ in response_headers}
+                    chunked = b"content-length" not in names and status not in (204, 304)
+                    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}".encode()]
+                    lines += [name + b": " + value for name, value in response_headers]
+                    if chunked:
+                        lines.append(b"transfer-encoding: chunked")
+                    if not keep_alive:
+                        lines.append(b"connection: close")
+                    writer.write(b"\r\n".join(lines) + b"\r\n\r\n")
+                elif message["type"] == "http.response.body":
+                    data = message.get("body", b"")
+                    if chunked:
+                        if data:
+                            writer.write(b"%x\r\n%b\r\n" % (len(data), data))
+                        if not message.get("more_body", False):
+                            writer.write(b"0\r\n\r\n")
+                    else:
+                        writer.write(data)
+                    await writer.drain()
+
+            await asgi_app(scope, receive, send)
+            if not quiet:
+                print(f'{client[0]} - - "{method} {target} {version}" {status}')
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_asgi(host: str, port: int, quiet: bool = False):
+    from asgi import application
+
+    # run the app's lifespan startup/shutdown around the server
+    lifespan = asyncio.Queue()
+    await lifespan.put({"type": "lifespan.startup"})
+    lifespan_done = asyncio.Event()
+
+    async def lifespan_send(message):
+        if message["type"] == "lifespan.shutdown.complete":
+            lifespan_done.set()
+
+    lifespan_task = asyncio.create_task(
+        application({"type": "lifespan"}, lifespan.get, lifespan_send)
+    )
+
+    server = await asyncio.start_server(
+        lambda r, w: handle_connection(application, host, port, r, w, quiet),
+        host, port
+    )
+    print(f"Serving ASGI on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await lifespan.put({"type": "lifespan.shutdown"})
+        await lifespan_done.wait()
+        await lifespan_task
+
+
+def serve_asgi(host: str, port: int, quiet: bool = False):
+    try:
+        asyncio.run(run_asgi(host, port, quiet))
+    except KeyboardInterrupt:
+        pass
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+
+    return sorted_values[k]
+
+
+def loadtest(urls, concurrency: int = 8, duration: float = 10.0, headers=None):
+    """
+    Request `urls` round-robin from `concurrency` threads, each with its own
+    keep-alive connection, for `duration` seconds. Returns summary stats.
+    """
+    headers = headers or dict()
+    targets = []
+    for url in urls:
+        parts = urlsplit(url)
+        target = parts.path + (f"?{parts.query}" if parts.query else "")
+        targets.append((parts.hostname, parts.port or 80, target))
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(offset):
+        con = None
+        own_latencies = []
+        own_errors = 0
+        i = offset
+        while time.perf_counter() < deadline:
+            host, port, target = targets[i % len(targets)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                if con is None:
+                    con = http.client.HTTPConnection(host, port, timeout=30)
+                con.request("GET", target, headers=headers)
+                response = con.getresponse()
+                response.read()
+                if response.status >= 500:
+                    own_errors += 1
+                if response.will_close:
+                    con.close()
+                    con = None
+            except (OSError, http.client.HTTPException):
+                own_errors += 1
+                if con is not None:
+                    con.close()
+                con = None
+                continue
+            own_latencies.append(time.perf_counter() - start)
+        if con is not None:
+            con.close()
+
+        with lock:
+            latencies.extend(own_latencies)
+            errors.append(own_errors)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    return dict(
+        requests=len(latencies),
+        errors=sum(errors),
+        seconds=elapsed,
+        requests_per_second=len(latencies) / elapsed,
+        p50_ms=1000 * percentile(latencies, 50),
+        p90_ms=1000 * percentile(latencies, 90),
+        p99_ms=1000 * percentile(latencies, 99),
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Serve the recipe site or load test it")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for mode in ("wsgi", "asgi"):
+        mode_parser = subparsers.add_parser(mode, help=f"serve the app in {mode} mode")
+        mode_parser.add_argument("--host", default="127.0.0.1")
+        mode_parser.add_argument("--port", type=int, default=8000)
+        mode_parser.add_argument("--quiet", action="store_true", help="don't log requests")
+
+    loadtest_parser = subparsers.add_parser("loadtest", help="measure throughput of a running server")
+    loadtest_parser.add_argument("urls", nargs="+")
+    loadtest_parser.add_argument("--concurrency", type=int, default=8)
+    loadtest_parser.add_argument("--duration", type=float, default=10.0)
+    loadtest_parser.add_argument(
+        "--gzip", action="store_true", help="send Accept-Encoding: gzip"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "wsgi":
+        serve_wsgi(args.host, args.port, args.quiet)
+    elif args.command == "asgi":
+        serve_asgi(args.host, args.port, args.quiet)
+    else:
+        headers = {"Accept-Encoding": "gzip"} if args.gzip else None
+        stats = loadtest(args.urls, args.concurrency, args.duration, headers)
+        print(json.dumps(stats, indent=2))
@@ -0,0 +1,267 @@
+"""
+Precompute "similar recipes" from ingredient, name and direction text.
+
+Every recipe becomes a sparse TF-IDF vector (sublinear term frequency,
+smoothed idf, L2-normalized) and its top-k neighbors by cosine similarity
+are stored in recipe_neighbors, so a recipe page only reads its own rows.
+Vectors are dicts and the similarities are accumulated over an inverted
+index, which keeps the job in plain Python. To bound the work on large
+catalogs, each vector keeps only its MAX_TERMS heaviest terms, each term's
+posting list only its MAX_POSTINGS heaviest recipes, and terms used by
+more than MAX_DF of the recipes are dropped; scores are cosine
+similarities of the pruned vectors.
+
+Runs are incremental: only recipes whose content hash changed, plus the
+recipes whose neighbor lists they enter or leave, are recomputed.
+"""
+from collections import Counter
+import hashlib
+import heapq
+import json
+import logging
+import math
+import re
+import time
+import dbtools as dbt
+from ingredients import ingredient_terms, singularize
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_K = 10
+MAX_TERMS = 24
+MAX_POSTINGS = 200
+MAX_DF = 0.5
+
+# ingredients say more about a dish than its method does
+FIELD_WEIGHTS = {"i": 2.0, "n": 1.5, "d": 1.0}
+
+WORD_RE = re.compile(r"[a-z][a-z'-]+")
+STOPWORDS = {
+    "the", "and", "for", "with", "into", "until", "then", "from", "over",
+    "about", "add", "all", "are", "but", "each", "end", "its", "let", "off",
+    "once", "onto", "out", "some", "that", "this", "too", "use",
+    "very", "when", "while", "will", "you", "your", "before", "after", "is",
+    "in", "of", "on", "or", "to", "it", "be", "as", "at", "by", "if", "an",
+}
+
+
+def load_recipe_texts(cur):
+    """
+    Return {recipe_id: (recipe_name, [items], [directions])} for the whole
+    catalog, in three ordered scans.
+    """
+    texts = {
+        recipe_id: (recipe_name, [], [])
+        for recipe_id, recipe_name in cur.execute("SELECT recipe_id, recipe_name FROM recipes")
+    }
+    for recipe_id, item in cur.execute(
+            "SELECT recipe_id, item FROM ingredients WHERE item IS NOT NULL ORDER BY recipe_id, ingredient_number"):
+        if recipe_id in texts:
+            texts[recipe_id][1].append(item)
+    for recipe_id, direction in cur.execute(
+            "SELECT recipe_id, direction FROM directions ORDER BY recipe_id, direction_number"):
+        if recipe_id in texts:
+            texts[recipe_id][2].append(direction)
+
+    return texts
+
+
+def content_hash(recipe_name, items, directions):
+    text = "\x1e".join([recipe_name, "\x1f".join(items), "\x1f".join(directions)])
+
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def recipe_features(recipe_name, items, directions, memo=None):
+    """
+    Count a recipe's terms, prefixed by the field they come from. `memo`
+    may be a dict shared across calls to cache the terms of each item and
+    word, which repeat across recipes far more often than not.
+    """
+    if memo is None:
+        memo = dict()
+
+    features = Counter()
+    for item in items:
+        terms = memo.get(("i", item))
+        if terms is None:
+            terms = memo[("i", item)] = [f"i:{term}" for term in ingredient_terms(item)]
+        features.update(terms)
+
+    for field, text in (("n", recipe_name), ("d", " ".join(directions))):
+        for word, count in Counter(WORD_RE.findall(text.lower())).items():
+            term = memo.get((field, word))
+            if term is None:
+                term = memo[(field, word)] = "" if word in STOPWORDS else f"{field}:{singularize(word)}"
+            if term:
+                features[term] += count
+
+    return features
+
+
+def build_vectors(features_by_recipe, max_df: float = MAX_DF, max_terms: int = MAX_TERMS):
+    """
+    Turn term counts into pruned, L2-normalized TF-IDF vectors
+    {recipe_id: {term: weight}}.
+    """
+    n_recipes = len(features_by_recipe)
+    df = Counter()
+    for features in features_by_recipe.values():
+        df.update(features.keys())
+
+    # a term in one recipe matches nothing; one in most matches everything
+    max_count = max(2, max_df * n_recipes)
+    idf = {
+        term: (1.0 + math.log((1 + n_recipes) / (1 + count))) * FIELD_WEIGHTS[term[0]]
+        for term, count in df.items() if 2 <= count <= max_count
+    }
+
+    vectors = dict()
+    for recipe_id, features in features_by_recipe.items():
+        weights = [
+            (term, (1.0 + math.log(count)) * idf[term])
+            for term, count in features.items() if term in idf
+        ]
+        if len(weights) > max_terms:
+            weights = heapq.nlargest(max_terms, weights, key=lambda tw: tw[1])
+        norm = math.sqrt(sum(w * w for _, w in weights))
+        vectors[recipe_id] = {term: w / norm for term, w in weights} if norm else dict()
+
+    return vectors
+
+
+def build_postings(vectors, max_postings: int = MAX_POSTINGS):
+    """
+    Return {term: [(recipe_id, weight), ...]}, keeping each term's
+    max_postings heaviest recipes.
+    """
+    postings = dict()
+    for recipe_id, vector in vectors.items():
+        for term, w in vector.items():
+            postings.setdefault(term, []).append((recipe_id, w))
+
+    for term, posting in postings.items():
+        if len(posting) > max_postings:
+            postings[term] = heapq.nlargest(max_postings, posting, key=lambda rw: rw[1])
+
+    return postings
+
+
+def nearest(recipe_id, vector, postings, k: int = DEFAULT_K):
+    """
+    Return the k most similar (neighbor_id, score) pairs, best first.
+    """
+    scores = dict()
+    get = scores.get
+    for term, w in vector.items():
+        for other_id, other_w in postings.get(term, ()):
+            scores[other_id] = get(other_id, 0.0) + w * other_w
+    scores.pop(recipe_id, None)
+
+    return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+def refresh_recipe_neighbors(con, k: int = DEFAULT_K, full: bool = False):
+    """
+    Recompute recipe_neighbors for the recipes whose content changed since
+    the last run (every recipe if full or on the first run) and for the
+    recipes whose neighbors that affects. Returns (n_changed, n_recomputed).
+
+    The idf of unchanged recipes' terms drifts as the catalog grows; run
+    with full=True now and then to recompute everything.
+    """
+    start = time.perf_counter()
+    cur = con.cursor()
+
+    texts = load_recipe_texts(cur)
+    hashes = {rid: content_hash(*text) for rid, text in texts.items()}
+    stored_hashes = dict(cur.execute("SELECT recipe_id, content_hash FROM recipe_neighbor_state"))
+
+    changed = {rid for rid, h in hashes.items() if stored_hashes.get(rid) != h}
+    deleted = {rid for rid in stored_hashes if rid not in hashes}
+    if not (changed or deleted or full):
+        return 0, 0
+
+    memo = dict()
+    vectors = build_vectors({rid: recipe_features(*text, memo=memo) for rid, text in texts.items()})
+    postings = build_postings(vectors)
+
+    neighbors = dict()
+    if full or not stored_hashes:
+        to_compute = set(vectors)
+    else:
+        # recipes whose stored neighbors changed or disappeared
+        cur.execute(
+            "SELECT DISTINCT recipe_id FROM recipe_neighbors WHERE neighbor_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(sorted(changed | deleted)),)
+        )
+        to_compute = changed | {row[0] for row in cur.fetchall()}
+
+        # similarity is symmetric: a changed recipe's new neighbors may now
+        # count it among theirs
+        for rid in changed:
+            neighbors[rid] = nearest(rid, vectors[rid], postings, k)
+            to_compute.update(other_id for other_id, _ in neighbors[rid])
+        to_compute -= deleted
+
+    for rid in to_compute:
+        if rid not in neighbors:
+            neighbors[rid] = nearest(rid, vectors[rid], postings, k)
+
+    try:
+        cur.execute("BEGIN")
+        stale_ids = json.dumps(sorted(set(neighbors) | deleted))
+        cur.execute(
+            "DELETE FROM recipe_neighbors WHERE recipe_id IN (SELECT value FROM json_each(?))",
+            (stale_ids,)
+        )
+        cur.execute(
+            "DELETE FROM recipe_neighbor_state WHERE recipe_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(sorted(deleted)),)
+        )
+        cur.executemany(
+            "INSERT INTO recipe_neighbors (recipe_id, rank, neighbor_id, score) VALUES (?, ?, ?, ?)",
+            [
+                (rid, rank, other_id, round(score, 6))
+                for rid, ranked in neighbors.items()
+                for rank, (other_id, score) in enumerate(ranked)
+            ]
+        )
+        cur.executemany(
+            "INSERT OR REPLACE INTO recipe_neighbor_state (recipe_id, content_hash) VALUES (?, ?)",
+            [(rid, hashes[rid]) for rid in changed]
+        )
+
+        # recipe pages show the neighbors
+        dbt.bump_meta_value(cur, "catalog_version")
+        cur.execute("COMMIT")
+    except:
+        if con.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+
+    logger.info(
+        "Recomputed neighbors of %d recipes (%d changed, %d removed) in %.1fs",
+        len(neighbors), len(changed), len(deleted), time.perf_counter() - start
+    )
+
+    return len(changed), len(neighbors)
+
+
+if __name__ == "__main__":
+    import argparse
+    from pathlib import Path
+    import sqlite3
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Precompute similar recipes")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="neighbors kept per recipe")
+    parser.add_argument("--full", action="store_true", help="recompute every recipe")
+    args = parser.parse_args()
+
+    con = sqlite3.connect(Path(app.root_path)/".."/"data"/"recipe.db")
+    dbt.create_db(con)
+    n_changed, n_recomputed = refresh_recipe_neighbors(con, k=args.k, full=args.full)
+    print(f"Recomputed neighbors of {n_recomputed} recipes ({n_changed} changed)")
+    con.close()
@@ -0,0 +1,158 @@
+from collections import deque
+from datetime import datetime, timezone
+import logging
+import re
+import sqlite3
+import threading
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_RE = re.compile(r"\s+")
+STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+
+# statements that have a query plan worth capturing
+EXPLAINABLE = ("select", "with", "insert", "update", "delete", "replace")
+
+
+def normalize_sql(sql: str):
+    """
+    Collapse whitespace and replace inline literals with ?, so the variants
+    of one dynamic query group together.
+    """
+    sql = STRING_LITERAL_RE.sub("?", sql)
+    sql = NUMBER_LITERAL_RE.sub("?", sql)
+
+    return WHITESPACE_RE.sub(" ", sql).strip().rstrip(";").rstrip()
+
+
+def redact_value(value):
+    if value is None:
+        return None
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__} len={len(value)}>"
+
+    return f"<{type(value).__name__}>"
+
+
+def is_parameter_sets(parameters):
+    """
+    Whether parameters is executemany's sequence of parameter sets rather
+    than the parameters of one statement, whose values are never lists,
+    tuples or dicts.
+    """
+    return (isinstance(parameters, (list, tuple)) and len(parameters) > 0
+            and isinstance(parameters[0], (list, tuple, dict)))
+
+
+def describe_parameters(parameters, redact: bool):
+    if is_parameter_sets(parameters):
+        return dict(first=describe_parameters(parameters[0], redact), sets=len(parameters))
+    if isinstance(parameters, dict):
+        return {key: redact_value(v) if redact else v for key, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact_value(v) if redact else v for v in parameters]
+
+    # executemany's iterable of parameter sets, already consumed
+    return "<many>"
+
+
+def format_query_plan(rows):
+    """
+    Render EXPLAIN QUERY PLAN rows (id, parent, notused, detail) as an
+    indented tree, one node per line.
+    """
+    depth = {0: -1}
+    lines = []
+    for node_id, parent_id, _, detail in rows:
+        depth[node_id] = depth.get(parent_id, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+
+    return lines
+
+
+class SlowQueryLog:
+    """
+    Keeps the most recent statements slower than `threshold_ms`, with
+    their normalized SQL, parameters (redacted unless `redact` is False),
+    duration and EXPLAIN QUERY PLAN. Install it with install(); it is
+    called by metrics.InstrumentedCursor once a statement's rows have been
+    read.
+    """
+
+    def __init__(self, threshold_ms: float = 100.0, max_entries: int = 200, redact: bool = True):
+        self.threshold = threshold_ms / 1000
+        self.redact = redact
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=max_entries)
+        self._n_recorded = 0
+
+    def install(self):
+        if self not in metrics.statement_hooks:
+            metrics.statement_hooks.append(self)
+
+    def uninstall(self):
+        if self in metrics.statement_hooks:
+            metrics.statement_hooks.remove(self)
+
+    def explain(self, con, sql, parameters):
+        if not sql.lstrip().lower().startswith(EXPLAINABLE):
+            return None
+        if not isinstance(parameters, (dict, list, tuple)):
+            return None
+        # an executemany runs one plan for every set; explain the first
+        if is_parameter_sets(parameters):
+            parameters = parameters[0]
+
+        # a plain cursor, so explaining is not itself timed or logged
+        cur = con.cursor(sqlite3.Cursor)
+        cur.row_factory = None
+        try:
+            return format_query_plan(cur.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall())
+        except sqlite3.Error as e:
+            return [f"<explain failed: {e}>"]
+        finally:
+            cur.close()
+
+    def __call__(self, con, sql, parameters, seconds):
+        if seconds < self.threshold:
+            return
+
+        entry = dict(
+            at=datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            ms=round(1000 * seconds, 3),
+            sql=normalize_sql(sql),
+            parameters=describe_parameters(parameters, self.redact),
+            plan=self.explain(con, sql, parameters),
+        )
+        with self._lock:
+            self._entries.append(entry)
+            self._n_recorded += 1
+
+        if logger.isEnabledFor(logging.WARNING):
+            plan = "; ".join(line.strip() for line in entry["plan"] or [])
+            logger.warning(
+                "Slow query (%.1f ms): %s params=%s plan=[%s]",
+                entry["ms"], entry["sql"], entry["parameters"], plan
+            )
+
+    def entries(self):
+        """
+        Return the recorded entries, slowest first.
+        """
+        with self._lock:
+            entries = list(self._entries)
+
+        return sorted(entries, key=lambda entry: entry["ms"], reverse=True)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                threshold_ms=1000 * self.threshold,
+                redact=self.redact,
+                recorded=self._n_recorded,
+                kept=len(self._entries),
+                max_entries=self._entries.maxlen,
+            )
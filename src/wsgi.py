@@ -1,6 +1,8 @@
 from app import app
 
-#application = app.server
+# uwsgi (and other WSGI servers) look for `application`; see asgi.py for
+# the asyncio entry point
+application = app
 
 if __name__ == '__main__':
     application.run()
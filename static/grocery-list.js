@@ -11,45 +11,7 @@ function populateSelect(selId) {
   opt.text = "-- Search for a Recipe --";
   sel.add(opt);
 
-  $("#" + selId).selectize({
-    create: false,
-    searchField: "recipe_name",
-    labelField:  "recipe_name",
-    sortField:   "recipe_name",
-    valueField:  "recipe_id",
-    maxItems: 1,
-    closeAfterSelect: true,
-    render: {
-      option: function (item, escape) {
-        return (
-          "<div style='margin-bottom: 5px;'>" +
-         "<span>" + item.recipe_name + "</span>" +
-         "</div>"
-        );
-      },
-    },
-    load: function (query, callback) {
-      if (!query.length) return callback();
-      $.ajax({
-        url: "../recipe-search?search-terms=" + encodeURIComponent(query),
-        type: "GET",
-        error: function () {
-          callback();
-        },
-        success: function (res) {
-          console.log(res)
-          callback(res);
-        },
-      });
-    },
-    onChange: function(value){
-      if (value != "") {
-        enableCount(i);
-      } else{
-        disableCount(i);
-      }
-    },
-  });
+  makeRecipePicker("#" + selId);
 }
 
 function getNewId() {
@@ -1,8 +1,5 @@
 function onLoadPage(){
-   $("#recipe_list").selectize({
-     create: true,
-     sortField: "text"
-   });
+   makeRecipePicker("#recipe_list");
 }
 
 function recipeRedirect(){
@@ -0,0 +1,79 @@
+// Recipe pickers load the catalog a page at a time from recipe-picker.json:
+// the first page of names when the picker is opened (all of them, by name)
+// or typed in (those with words starting with the typed words), then the
+// next page whenever the dropdown is scrolled to the bottom.
+
+const recipePickerUrl = "/recipe-site/recipe-picker.json";
+
+function fetchRecipePickerPage(query, cursor) {
+  var params = query ? { q: query } : {};
+  if (cursor) {
+    params.after_name = cursor.after_name;
+    params.after_id = cursor.after_id;
+  }
+
+  return $.getJSON(recipePickerUrl, params);
+}
+
+function makeRecipePicker(selector, onChange) {
+  // the cursor of each loaded query's next page (null once exhausted);
+  // selectize does not reload queries it has seen
+  var nextCursors = {};
+  var loadingMore = false;
+
+  var $sel = $(selector).selectize({
+    create: false,
+    valueField:  "recipe_id",
+    labelField:  "recipe_name",
+    searchField: "recipe_name",
+    sortField:   "recipe_name",
+    maxItems: 1,
+    closeAfterSelect: true,
+    preload: "focus",
+    render: {
+      option: function (item, escape) {
+        return (
+          "<div style='margin-bottom: 5px;'>" +
+          "<span>" + escape(item.recipe_name) + "</span>" +
+          "</div>"
+        );
+      },
+    },
+    load: function (query, callback) {
+      fetchRecipePickerPage(query.trim(), null)
+        .done(function (page) {
+          nextCursors[query] = page.next;
+          callback(page.recipes);
+        })
+        .fail(function () {
+          callback();
+        });
+    },
+    onChange: function (value) {
+      if (onChange) {
+        onChange(value);
+      }
+    },
+  });
+
+  var picker = $sel[0].selectize;
+  picker.$dropdown_content.on("scroll", function () {
+    var content = this;
+    var query = picker.lastQuery || "";
+    if (loadingMore || !nextCursors[query]) return;
+    if (content.scrollTop + content.clientHeight < content.scrollHeight - 20) return;
+
+    loadingMore = true;
+    fetchRecipePickerPage(query.trim(), nextCursors[query])
+      .done(function (page) {
+        nextCursors[query] = page.next;
+        picker.addOption(page.recipes);
+        picker.refreshOptions(false);
+      })
+      .always(function () {
+        loadingMore = false;
+      });
+  });
+
+  return picker;
+}
@@ -0,0 +1,27 @@
+import os
+from pathlib import Path
+import sqlite3
+import sys
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parent.parent/"src"
+sys.path.insert(0, str(SRC_DIR))
+
+
+@pytest.fixture(scope="session")
+def app_client(tmp_path_factory):
+    """
+    A test client for the site, on an empty catalog in a temporary data dir.
+    """
+    import dbtools as dbt
+
+    data_dir = tmp_path_factory.mktemp("data")
+    con = sqlite3.connect(data_dir/"recipe.db")
+    dbt.create_db(con)
+    con.close()
+
+    # app reads its settings at import
+    os.environ["RECIPE_SITE_DATA_DIR"] = str(data_dir)
+    from app import app
+
+    return app.test_client()
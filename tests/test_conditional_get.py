@@ -0,0 +1,32 @@
+import sqlite3
+
+
+def test_todays_recipe_uses_the_etag_clock(app_client, monkeypatch):
+    import app as app_module
+
+    seen = []
+    monkeypatch.setattr(app_module, "get_today_date", lambda: "2030-01-07")
+    monkeypatch.setattr(app_module, "get_days_recipe_id", seen.append)
+    app_module.get_todays_recipe_id()
+
+    assert seen == ["2030-01-07"]
+
+
+def test_only_the_etag_validates(app_client):
+    import dbtools as dbt
+    from app import data_dir
+
+    con = sqlite3.connect(f"{data_dir}/recipe.db")
+    dbt.bump_catalog_version(con)
+    con.close()
+
+    response = app_client.get("/recipe-site/recipe-picker.json")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+
+    assert app_client.get("/recipe-site/recipe-picker.json", headers={"If-None-Match": etag}).status_code == 304
+
+    # a catalog change within the same second leaves Last-Modified as is
+    response = app_client.get("/recipe-site/recipe-picker.json", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 200
@@ -0,0 +1,63 @@
+import sqlite3
+import threading
+from dbpool import ConnectionPool
+
+
+def make_db(path):
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE t (x INTEGER)")
+    con.execute("INSERT INTO t VALUES (1)")
+    con.commit()
+    con.close()
+
+
+def test_readers_use_wal_before_any_write(tmp_path):
+    db_path = tmp_path/"recipe.db"
+    make_db(db_path)
+
+    pool = ConnectionPool(str(db_path))
+    con = pool.checkout()
+    try:
+        assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        pool.checkin(con)
+
+
+def test_reader_sees_committed_data_while_a_write_is_open(tmp_path):
+    db_path = tmp_path/"recipe.db"
+    make_db(db_path)
+    pool = ConnectionPool(str(db_path))
+
+    writer = pool.checkout_write()
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO t VALUES (2)")
+    reader = pool.checkout()
+    try:
+        assert reader.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+    finally:
+        pool.checkin(reader)
+        writer.commit()
+        pool.checkin_write(writer)
+
+
+def test_concurrent_checkouts(tmp_path):
+    db_path = tmp_path/"recipe.db"
+    make_db(db_path)
+    pool = ConnectionPool(str(db_path), max_idle=2)
+
+    def work():
+        for _ in range(200):
+            con = pool.checkout()
+            assert pool.is_current(con)
+            con.execute("SELECT x FROM t").fetchall()
+            pool.checkin(con)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = pool.stats()
+    assert stats["in_use"] == 0
+    assert stats["opened"] - stats["closed"] == stats["idle"] == len(pool._con_paths)
@@ -0,0 +1,83 @@
+from pathlib import Path
+import sqlite3
+import pytest
+import dbtools as dbt
+import extract
+
+
+ORG_DIR = Path(__file__).resolve().parent/"data"/"org"
+
+
+@pytest.fixture
+def con():
+    con = sqlite3.connect(":memory:")
+    dbt.create_db(con)
+    yield con
+    con.close()
+
+
+def org_recipes():
+    return [recipe for fp in sorted(ORG_DIR.glob("*.org")) for recipe in extract.extract_data(fp)]
+
+
+def ingredient_terms(con):
+    return {
+        term: (n_recipes, dbt.decode_ids(blob).tolist())
+        for term, n_recipes, blob in con.execute("SELECT term, n_recipes, recipe_ids FROM ingredient_terms")
+    }
+
+
+def test_incremental_ingredient_terms_match_a_rebuild(con):
+    # one batch per recipe, so each merges into the postings of the last
+    dbt.update_db(con, org_recipes(), batch_size=1)
+    incremental = ingredient_terms(con)
+
+    dbt.refresh_ingredient_terms(con.cursor())
+    con.commit()
+
+    assert incremental == ingredient_terms(con)
+    assert incremental["lemon"] == (1, [1])
+    assert incremental["chicken"] == (2, [1, 2])
+
+
+def test_delete_recipes_drops_their_neighbors(con):
+    dbt.update_db(con, org_recipes())
+    con.executemany(
+        "INSERT INTO recipe_neighbors (recipe_id, rank, neighbor_id, score) VALUES (?, ?, ?, ?)",
+        [(1, 0, 2, 0.5), (1, 1, 3, 0.4), (2, 0, 1, 0.5), (3, 0, 4, 0.3)]
+    )
+    con.executemany(
+        "INSERT INTO recipe_neighbor_state (recipe_id, content_hash) VALUES (?, ?)",
+        [(1, "a"), (2, "b"), (3, "c"), (4, "d")]
+    )
+    con.commit()
+
+    cur = con.cursor()
+    dbt.delete_recipes(cur, [2])
+    con.commit()
+
+    assert cur.execute("SELECT recipe_id, neighbor_id FROM recipe_neighbors ORDER BY 1, 2").fetchall() == [
+        (1, 3), (3, 4)
+    ]
+    # recipe 1 listed recipe 2, so its list is recomputed on the next run
+    assert cur.execute("SELECT recipe_id FROM recipe_neighbor_state ORDER BY 1").fetchall() == [(3,), (4,)]
+
+
+def test_update_db_bumps_the_version_with_each_batch(con):
+    recipes = org_recipes()
+    cur = con.cursor()
+    version = dbt.get_catalog_version(cur)
+
+    def failing_after(n):
+        yield from recipes[:n]
+        raise RuntimeError("extraction failed")
+
+    # the first batch is committed before the run aborts
+    with pytest.raises(RuntimeError):
+        dbt.update_db(con, failing_after(3), batch_size=2)
+    assert cur.execute("SELECT COUNT(*) FROM recipes").fetchone()[0] == 2
+    assert dbt.get_catalog_version(cur) == version + 1
+
+    # nothing new, nothing to bump
+    dbt.update_db(con, recipes[:2])
+    assert dbt.get_catalog_version(cur) == version + 1
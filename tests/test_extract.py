@@ -0,0 +1,110 @@
+from pathlib import Path
+import pytest
+import extract
+import legacy_extract
+
+
+ORG_DIR = Path(__file__).resolve().parent/"data"/"org"
+
+PROPERTIES = [{
+    "source_file": "properties.org",
+    "title": "Weeknight Dal",
+    "prep-time": "10 min",
+    "cook-time": "35 min",
+    "servings": "4",
+    "source-url": "https://example.com/recipes/dal",
+    "ingredients": [
+        (None, "1 cup red lentils"),
+        (None, "3 cups water"),
+        (None, "1 tsp turmeric"),
+    ],
+    "directions": [
+        "Rinse the lentils.",
+        "Simmer with the water and turmeric until soft.",
+    ],
+}]
+
+CONTINUATION = [{
+    "source_file": "continuation.org",
+    "title": "Lemon Risotto",
+    "servings": "2",
+    "ingredients": [
+        (None, "1 cup arborio rice"),
+        (None, "4 cups chicken stock or vegetable stock"),
+        (None, "1 lemon, zested and juiced"),
+    ],
+    "directions": [
+        "Warm the stock in a small pot\nand keep it at a simmer.",
+        "Toast the rice in butter,\nthen add the stock a ladle at a time,\nstirring until absorbed.",
+        "Stir in the lemon.",
+    ],
+}]
+
+# grouped ingredients come first, as they always have
+GROUPS = [{
+    "source_file": "groups.org",
+    "title": "Chicken Tacos",
+    "ingredients": [
+        ("Marinade", "2 tbsp lime juice"),
+        ("Marinade", "1 tsp cumin"),
+        ("Salsa", "2 tomatoes"),
+        ("Salsa", "1/2 onion"),
+        (None, "1 lb chicken thighs"),
+        (None, "8 corn tortillas"),
+    ],
+    "directions": [
+        "Marinate the chicken for an hour.",
+        "Grill the chicken and slice it.",
+        "Serve in warm tortillas with the salsa.",
+    ],
+}]
+
+MULTI = [
+    {
+        "source_file": "multi.org",
+        "title": "Pancakes",
+        "servings": "4",
+        "ingredients": [(None, "1 cup flour"), (None, "1 egg"), (None, "1 cup milk")],
+        "directions": ["Whisk everything together.", "Fry in a hot pan."],
+    },
+    {
+        "source_file": "multi.org",
+        "title": "Green Salad",
+        "ingredients": [(None, "1 head lettuce"), (None, "2 tbsp vinaigrette")],
+        "directions": ["Toss the lettuce with the vinaigrette."],
+    },
+]
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("properties.org", PROPERTIES),
+    ("continuation.org", CONTINUATION),
+])
+def test_extract_matches_legacy_extractor(name, expected):
+    recipes = extract.extract_data(ORG_DIR/name)
+
+    assert recipes == expected
+    assert recipes == legacy_extract.extract_data(ORG_DIR/name)
+
+
+def test_extract_ingredient_groups():
+    assert extract.extract_data(ORG_DIR/"groups.org") == GROUPS
+
+    # the legacy extractor left the whitespace of the removed groups on the
+    # last ungrouped ingredient
+    legacy = legacy_extract.extract_data(ORG_DIR/"groups.org")
+    assert legacy[0]["ingredients"][-1] == (None, "8 corn tortillas ")
+
+
+def test_extract_empty_file():
+    assert extract.extract_data(ORG_DIR/"empty.org") == []
+
+    # the legacy extractor returned an empty dict
+    assert legacy_extract.extract_data(ORG_DIR/"empty.org") == {}
+
+
+def test_extract_every_recipe_of_a_file():
+    assert extract.extract_data(ORG_DIR/"multi.org") == MULTI
+
+    # the legacy extractor returned the first recipe once per heading
+    assert legacy_extract.extract_data(ORG_DIR/"multi.org") == [MULTI[0], MULTI[0]]
@@ -0,0 +1,9 @@
+def test_bad_limit_falls_back_to_the_default(app_client):
+    for limit in ("abc", "", "2.5"):
+        response = app_client.get(f"/recipe-site/ingredient-search?ingredients=garlic&limit={limit}")
+        assert response.status_code == 200
+        assert set(response.get_json()) == {"recipes", "total", "unknown"}
+
+
+def test_no_ingredients_is_refused(app_client):
+    assert app_client.get("/recipe-site/ingredient-search").status_code == 400
@@ -0,0 +1,48 @@
+import os
+from pathlib import Path
+import sqlite3
+import subprocess
+import sys
+import dbtools as dbt
+
+
+SRC_DIR = Path(__file__).resolve().parent.parent/"src"
+
+
+def make_old_db(path, version):
+    """
+    A db as an older release left it, at user_version `version`.
+    """
+    con = sqlite3.connect(path)
+    for create_table in (dbt.create_recipe_table, dbt.create_ingredient_table,
+                         dbt.create_direction_table, dbt.create_recipe_schedule_table,
+                         dbt.create_recipe_search_table, dbt.create_catalog_meta_table,
+                         dbt.create_ingest_manifest_table):
+        create_table(con)
+    con.commit()
+
+    migrations = dbt.MIGRATIONS[:]
+    try:
+        dbt.MIGRATIONS[:] = migrations[:version]
+        dbt.migrate_db(con)
+    finally:
+        dbt.MIGRATIONS[:] = migrations
+    con.close()
+
+
+def test_app_start_migrates_an_old_db(tmp_path):
+    make_old_db(tmp_path/"recipe.db", 5)
+
+    # app migrates at import, so start it in a fresh interpreter
+    script = (
+        "from app import app\n"
+        "client = app.test_client()\n"
+        "for url in ('/recipe-site/ingredient-search?ingredients=garlic', '/recipe-site/recipe/1'):\n"
+        "    assert client.get(url).status_code == 200, url\n"
+    )
+    env = dict(os.environ, RECIPE_SITE_DATA_DIR=str(tmp_path))
+    subprocess.run([sys.executable, "-c", script], cwd=SRC_DIR, env=env, check=True)
+
+    con = sqlite3.connect(tmp_path/"recipe.db")
+    assert con.execute("PRAGMA user_version").fetchone()[0] == len(dbt.MIGRATIONS)
+    con.close()
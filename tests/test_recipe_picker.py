@@ -0,0 +1,49 @@
+import sqlite3
+import pytest
+import dbtools as dbt
+
+
+NAMES = ["Spicy Chicken Curry", "Chicken Soup", "Chickpea Salad", "Beef Stew", "Roast Chicken"]
+
+
+@pytest.fixture(scope="module")
+def picker(app_client):
+    from app import app, data_dir, recipe_name_index
+
+    con = sqlite3.connect(f"{data_dir}/recipe.db")
+    dbt.update_db(con, [dict(title=name, source_file="picker.org") for name in NAMES])
+    con.close()
+    with app.app_context():
+        recipe_name_index.refresh(force=True)
+
+    def get(**params):
+        response = app_client.get("/recipe-site/recipe-picker.json", query_string=params)
+        assert response.status_code == 200
+        page = response.get_json()
+        return [row["recipe_name"] for row in page["recipes"]], page["next"]
+
+    return get
+
+
+def test_typed_query_matches_words_anywhere_in_the_name(picker):
+    names, next_cursor = picker(q="chicken")
+
+    assert names == ["Chicken Soup", "Roast Chicken", "Spicy Chicken Curry"]
+    assert next_cursor is None
+
+
+def test_typed_query_pages_through_matches(picker):
+    names, next_cursor = picker(q="chi", limit=2)
+    assert names == ["Chicken Soup", "Chickpea Salad"]
+
+    names, next_cursor = picker(q="chi", limit=2, **next_cursor)
+    assert names == ["Roast Chicken", "Spicy Chicken Curry"]
+    assert next_cursor is None
+
+
+def test_empty_query_browses_by_name(picker):
+    names, next_cursor = picker(limit=2)
+    assert names == ["Beef Stew", "Chicken Soup"]
+
+    names, _ = picker(limit=2, **next_cursor)
+    assert names == ["Chickpea Salad", "Roast Chicken"]
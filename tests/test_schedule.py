@@ -0,0 +1,39 @@
+import sqlite3
+
+
+WEEK = "2030-01-06"
+
+
+def scheduled_rows():
+    from app import data_dir
+
+    con = sqlite3.connect(f"{data_dir}/recipe.db")
+    try:
+        return con.execute(
+            "SELECT day_of_week, recipe_id, quantity FROM recipe_schedule WHERE week_start = ? ORDER BY 1, 2",
+            (WEEK,)
+        ).fetchall()
+    finally:
+        con.close()
+
+
+def post_week(app_client, days, recipe_ids, counts):
+    response = app_client.post(
+        "/recipe-site/recipe-scheduler/create-schedule"
+        f"?week-start={WEEK}&weekdays-scheduled={days}&recipe-ids={recipe_ids}&recipe-counts={counts}"
+    )
+
+    return response.get_data(as_text=True)
+
+
+def test_clearing_a_week_deletes_its_rows(app_client):
+    assert post_week(app_client, "0,2", "1,2", "1,2") == "schedule-success"
+    assert scheduled_rows() == [(0, 1, 1), (2, 2, 2)]
+
+    # the scheduler page posts empty lists once every row is removed
+    assert post_week(app_client, "", "", "") == "schedule-success"
+    assert scheduled_rows() == []
+
+
+def test_bad_day_is_refused(app_client):
+    assert post_week(app_client, "7", "1", "1") == "schedule-failure"
@@ -0,0 +1,24 @@
+import sqlite3
+import metrics
+from slowlog import SlowQueryLog
+
+
+def test_slow_executemany_gets_a_plan():
+    con = sqlite3.connect(":memory:", factory=metrics.InstrumentedConnection)
+    con.execute("CREATE TABLE t (x INTEGER PRIMARY KEY, y TEXT)")
+    con.executemany("INSERT INTO t (x, y) VALUES (?, ?)", [(i, "a") for i in range(5)])
+
+    log = SlowQueryLog(threshold_ms=0.0, redact=False)
+    log.install()
+    try:
+        con.executemany("UPDATE t SET y = ? WHERE x = ?", [("b", 1), ("b", 2)])
+        # consumed generators cannot be explained, but are still logged
+        con.executemany("UPDATE t SET y = ? WHERE x = ?", (("c", i) for i in range(3, 5)))
+    finally:
+        log.uninstall()
+        con.close()
+
+    entries = {str(entry["parameters"]): entry for entry in log.entries()}
+    listed = entries[str(dict(first=["b", 1], sets=2))]
+    assert listed["plan"] == ["SEARCH t USING INTEGER PRIMARY KEY (rowid=?)"]
+    assert entries["<many>"]["plan"] is None
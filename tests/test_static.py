@@ -0,0 +1,32 @@
+import compression
+
+
+def test_static_route_rejects_parent_paths(app_client):
+    from app import static_hashes
+
+    n_hashes = len(static_hashes._hashes)
+    response = app_client.get("/recipe-site/static/..%2F..%2F..%2F..%2F..%2Fetc%2Fhostname")
+
+    assert response.status_code == 404
+    assert len(static_hashes._hashes) == n_hashes
+
+
+def test_static_route_serves_hashed_assets(app_client):
+    response = app_client.get("/recipe-site/static/recipe-picker.js")
+
+    assert response.status_code == 200
+    assert response.get_etag()[0]
+
+
+def test_static_hashes_skip_outside_and_special_files(tmp_path):
+    (tmp_path/"static").mkdir()
+    (tmp_path/"static"/"main.js").write_text("var x = 1;")
+    (tmp_path/"secret.txt").write_text("secret")
+    hashes = compression.StaticHashes(str(tmp_path/"static"))
+
+    assert hashes.get("main.js") is not None
+    assert hashes.get("../secret.txt") is None
+    assert hashes.get("/etc/hostname") is None
+    assert hashes.get("../../../../dev/zero") is None
+    assert hashes.get(".") is None
+    assert list(hashes._hashes) == ["main.js"]